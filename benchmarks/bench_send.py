@@ -0,0 +1,202 @@
+"""
+Offline Send Benchmark
+
+Runs synthetic contacts through the real send path of wasapy.py against a
+local stand-in for WhatsApp Web (benchmarks/fake_whatsapp.html), so changes to
+send_message_with_retry can be measured without a phone or network access.
+
+The fake page reproduces the DOM the bot relies on (new chat icon, number
+search box, result cells, "No se encontraron resultados" state, conversation
+panel, message box and outgoing bubbles) with configurable render latencies.
+
+Usage:
+    python benchmarks/bench_send.py --contacts 50
+    python benchmarks/bench_send.py --contacts 100 --compose type --latency-search 500
+    python benchmarks/bench_send.py --open link --prefill --invalid-rate 0.1 --headless
+    python benchmarks/bench_send.py --browser chromium --compose insert --headless
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from functools import partial
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import wasapy
+from browsers import get_browser, BROWSERS
+
+
+class FakeWhatsAppHandler(SimpleHTTPRequestHandler):
+    """
+    Serves fake_whatsapp.html for every path, with the latency configuration injected
+    """
+
+    config = {}
+
+    def do_GET(self):
+        with open(os.path.join(BENCH_DIR, "fake_whatsapp.html"), encoding="utf-8") as f:
+            page = f.read()
+        start = page.index("/*CONFIG*/")
+        end = page.index("/*END*/") + len("/*END*/")
+        page = page[:start] + json.dumps(self.config) + page[end:]
+
+        body = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(config):
+    handler = type("ConfiguredHandler", (FakeWhatsAppHandler,), {"config": config})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def instrument(timings):
+    """
+    Wrap the send path steps of wasapy so each call is timed under a step name
+    """
+    def timed(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name].append(time.perf_counter() - start)
+
+    for name in ("open_chat_via_search", "open_chat_via_link", "find_message_box", "compose_message", "reset_to_chat_list"):
+        setattr(wasapy, name, partial(timed, name, getattr(wasapy, name)))
+
+    wait_for = wasapy.wait_for
+
+    def timed_wait_for(driver, script, step, logger, *args):
+        return timed(f"wait_for:{step}", wait_for, driver, script, step, logger, *args)
+
+    wasapy.wait_for = timed_wait_for
+
+
+def isolate_state(directory):
+    """
+    Point the stateful globals of wasapy at files in directory, so the
+    benchmark neither reads nor writes the selector cache, invalid numbers,
+    result records or media cache of real runs
+    """
+    wasapy.selector_registry = wasapy.SelectorRegistry(path=os.path.join(directory, "selector_cache.json"))
+    wasapy.invalid_numbers = wasapy.InvalidNumberCache(path=os.path.join(directory, "invalid_numbers.txt"))
+    wasapy.delivery_tracker = wasapy.DeliveryTracker()
+    wasapy.media_cache = wasapy.MediaCache(directory=os.path.join(directory, "media"))
+    wasapy.result_log = wasapy.ResultLog()
+    wasapy.result_log.open(os.path.join(directory, "results.jsonl"))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def synthetic_contacts(count, invalid_rate):
+    invalid_every = int(1 / invalid_rate) if invalid_rate > 0 else 0
+    for index in range(1, count + 1):
+        if invalid_every and index % invalid_every == 0:
+            yield f"0{index:08d}", f"Invalid {index}"
+        else:
+            yield f"51900{index:06d}", f"Contacto {index}"
+
+
+def print_report(results, timings, elapsed):
+    sent = sum(1 for success in results if success)
+    print("=" * 60)
+    print("BENCHMARK RESULTS")
+    print(f"Contacts: {len(results)}  Sent: {sent}  Failed: {len(results) - sent}")
+    print(f"Elapsed: {elapsed:.1f} s  Throughput: {len(results) / elapsed * 60:.1f} messages/minute")
+    print("-" * 60)
+    print(f"{'step':32} {'calls':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for name, values in sorted(timings.items()):
+        print(
+            f"{name:32} {len(values):>6} "
+            f"{percentile(values, 0.5) * 1000:>8.0f} "
+            f"{percentile(values, 0.9) * 1000:>8.0f} "
+            f"{percentile(values, 0.99) * 1000:>8.0f}"
+        )
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the send path against a local fake WhatsApp Web page")
+    parser.add_argument("--contacts", "-n", type=int, default=20, help="Number of synthetic contacts (default: 20)")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Fraction of invalid numbers (default: 0)")
+    parser.add_argument("--compose", choices=wasapy.COMPOSE_MODES, default="paste", help="Compose mode (default: 'paste')")
+    parser.add_argument("--open", choices=wasapy.OPEN_MODES, default="search", help="Open mode (default: 'search')")
+    parser.add_argument("--prefill", action="store_true", help="Pre-fill the message through the chat link")
+    parser.add_argument("--template", "-t", default="default", help="Message template name (default: 'default')")
+    parser.add_argument("--browser", choices=BROWSERS, default="firefox", help="Browser to benchmark (default: 'firefox')")
+    parser.add_argument("--headless", action="store_true", help="Run the browser headless")
+    parser.add_argument("--debug", action="store_true", help="Show the bot's debug log")
+    for step, default in (("app", 500), ("drawer", 100), ("search", 200), ("open", 300), ("send", 150)):
+        parser.add_argument(f"--latency-{step}", type=int, default=default, help=f"Render latency of the fake page for '{step}' in ms (default: {default})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger("wasapy")
+
+    config = {
+        "latency": {step: getattr(args, f"latency_{step}") for step in ("app", "drawer", "search", "open", "send")},
+        "invalid_prefix": "0",
+    }
+    server = start_server(config)
+    wasapy.WHATSAPP_URL = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    timings = defaultdict(list)
+    instrument(timings)
+
+    state_dir = tempfile.TemporaryDirectory(prefix="wasapy_bench_")
+    isolate_state(state_dir.name)
+    driver = get_browser(args.browser).create(headless=args.headless)
+
+    try:
+        driver.get(wasapy.WHATSAPP_URL)
+        wait = WebDriverWait(driver, 30)
+        if not wasapy.wait_for(driver, wasapy.CHAT_LIST_READY_SCRIPT, "app_load", logger):
+            sys.exit("Fake WhatsApp page did not load")
+
+        results = []
+        start = time.perf_counter()
+        for numero, nombre in synthetic_contacts(args.contacts, args.invalid_rate):
+            contact_start = time.perf_counter()
+            results.append(wasapy.send_message_with_retry(
+                driver, wait, numero, nombre,
+                template_name=args.template,
+                compose_mode=args.compose,
+                open_mode=args.open,
+                prefill=args.prefill,
+            ))
+            timings["contact_total"].append(time.perf_counter() - contact_start)
+        elapsed = time.perf_counter() - start
+
+        print_report(results, timings, elapsed)
+    finally:
+        driver.quit()
+        server.shutdown()
+        wasapy.result_log.close()
+        state_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Browser Backends
+
+The browser-specific parts of the bot: how a browser is started with a
+profile, headless or lean, how text is inserted into the focused message
+box and how keys are pressed. The rest of the bot only uses WebDriver calls
+that work the same in every browser.
+
+Firefox uses Selenium only. Chromium also uses the DevTools protocol: text
+is inserted with Input.insertText like a keyboard input method would, keys
+are dispatched as native key events and, in lean mode, images, video and
+fonts are blocked at the network layer before they are downloaded.
+
+Usage:
+    from browsers import get_browser, browser_for
+
+    driver = get_browser("chromium").create("/path/to/user-data-dir", headless=True)
+    browser = browser_for(driver)
+    if not browser.insert_text(driver, message_box, "Hola\\nJuan"):
+        ...                                  # fall back to scripted insertion
+    browser.press_escape(driver)
+"""
+
+from selenium import webdriver
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+
+BROWSERS = ("firefox", "chromium")
+
+# Firefox preferences for lean mode: no images, media autoplay or animations
+LEAN_PREFERENCES = {
+    "permissions.default.image": 2,
+    "media.autoplay.default": 5,
+    "media.autoplay.blocking_policy": 2,
+    "image.animation_mode": "none",
+    "ui.prefersReducedMotion": 1,
+    "toolkit.cosmeticAnimations.enabled": False,
+    "dom.webnotifications.enabled": False,
+    "browser.sessionstore.resume_from_crash": False,
+}
+
+# Chromium flags for lean mode
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required",
+    "--force-prefers-reduced-motion",
+    "--disable-notifications",
+    "--mute-audio",
+]
+
+# Requests blocked through DevTools in lean mode: profile pictures, images, video and fonts
+BLOCKED_URLS = [
+    "*pps.whatsapp.net*",
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp",
+    "*.mp4", "*.webm",
+    "*.woff", "*.woff2", "*.ttf",
+]
+
+# WhatsApp Web rejects the user agent of headless Chromium
+CHROMIUM_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class FirefoxBrowser:
+    name = "firefox"
+
+    def create(self, profile=None, headless=False, lean=False):
+        options = FirefoxOptions()
+        options.add_argument("--user-agent=Mozilla/5.0")
+
+        if profile:
+            options.add_argument("-profile")
+            options.add_argument(profile)
+
+        if headless:
+            options.add_argument("-headless")
+
+        if lean or headless:
+            for name, value in LEAN_PREFERENCES.items():
+                options.set_preference(name, value)
+
+        return webdriver.Firefox(options=options)
+
+    def insert_text(self, driver, element, text):
+        """
+        Insert text into the element with a native input method
+
+        Returns:
+            bool: False, Firefox has no such method; the caller inserts the text by script
+        """
+        return False
+
+    def press_escape(self, driver):
+        driver.switch_to.active_element.send_keys(Keys.ESCAPE)
+
+
+class ChromiumBrowser:
+    name = "chromium"
+
+    def create(self, profile=None, headless=False, lean=False):
+        options = ChromeOptions()
+
+        if profile:
+            options.add_argument(f"--user-data-dir={profile}")
+
+        if headless:
+            options.add_argument("--headless=new")
+            options.add_argument(f"--user-agent={CHROMIUM_USER_AGENT}")
+
+        if lean or headless:
+            for argument in LEAN_ARGUMENTS:
+                options.add_argument(argument)
+
+        driver = webdriver.Chrome(options=options)
+        if lean or headless:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        return driver
+
+    def insert_text(self, driver, element, text):
+        """
+        Focus the element and insert the text with Input.insertText, one
+        DevTools call per line; lines are joined with Shift+Enter
+
+        Returns:
+            bool: True
+        """
+        driver.execute_script("arguments[0].focus();", element)
+        for index, line in enumerate(text.split("\n")):
+            if index > 0:
+                self._key(driver, "Enter", 13, modifiers=8, text="\r")
+            if line:
+                driver.execute_cdp_cmd("Input.insertText", {"text": line})
+        return True
+
+    def press_escape(self, driver):
+        self._key(driver, "Escape", 27)
+
+    def _key(self, driver, key, key_code, modifiers=0, text=None):
+        event = {"key": key, "code": key, "windowsVirtualKeyCode": key_code, "modifiers": modifiers}
+        if text:
+            driver.execute_cdp_cmd("Input.dispatchKeyEvent", {"type": "keyDown", "text": text, **event})
+        else:
+            driver.execute_cdp_cmd("Input.dispatchKeyEvent", {"type": "rawKeyDown", **event})
+        driver.execute_cdp_cmd("Input.dispatchKeyEvent", {"type": "keyUp", **event})
+
+
+_BACKENDS = {
+    "firefox": FirefoxBrowser(),
+    "chromium": ChromiumBrowser(),
+}
+
+
+def get_browser(name="firefox"):
+    """
+    Raises:
+        ValueError: If the browser is not supported
+    """
+    if name not in _BACKENDS:
+        raise ValueError(f"Browser '{name}' not supported. Available browsers: {', '.join(BROWSERS)}")
+    return _BACKENDS[name]
+
+
+def browser_for(driver):
+    """
+    Backend of a running driver: Chromium drivers expose the DevTools protocol
+    """
+    return _BACKENDS["chromium"] if hasattr(driver, "execute_cdp_cmd") else _BACKENDS["firefox"]
@@ -0,0 +1,296 @@
+"""
+Sender Daemon
+
+Local job API for a long-running bot: the browsers stay logged in between
+campaigns and send jobs are submitted over HTTP, on localhost or on a Unix
+socket. This module only keeps the job registry and serves the API; the
+caller provides the callbacks that queue the messages of a job and report
+the health of the senders.
+
+Jobs are JSON objects, either a CSV campaign or a single message:
+    {"csv": "contacts.csv", "template": "csv_message", "map": {"Oferta": "descuento"}}
+    {"numero": "987654321", "nombre": "Ana", "template": "promotional", "variables": {"descuento": "20%"}}
+
+API:
+    POST /jobs        Submit a job, returns the job with its id (202)
+    GET  /jobs        List all jobs
+    GET  /jobs/<id>   Status of one job: queued, running, done or failed
+    GET  /health      Sender status and queue size
+
+The API has no authentication: every local user and process can use it,
+unless it is served on a Unix socket, which only its owner can open.
+Requests from web pages are refused (they carry an Origin header, or a
+Host other than localhost), and jobs must be posted as application/json,
+so a page open in a browser cannot submit jobs.
+
+Usage:
+    from daemon import JobStore, start_server
+
+    jobs = JobStore()
+    server = start_server(jobs, submit_job, health, port=8765)
+    server.serve_forever()
+
+    curl -X POST localhost:8765/jobs -H "Content-Type: application/json" -d '{"csv": "contacts.csv"}'
+    curl --unix-socket /tmp/wasapy.sock http://localhost/jobs/1
+"""
+
+import os
+import re
+import json
+import threading
+import socketserver
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_PORT = 8765
+
+# Job fields and their JSON types, checked before a job is created
+JOB_FIELDS = {
+    "csv": str,
+    "template": str,
+    "map": dict,
+    "attachment": str,
+    "campaign": str,
+    "resume": bool,
+    "numero": (str, int),
+    "nombre": str,
+    "variables": dict,
+    "country_code": (str, int),
+}
+
+# Campaign ids name the journal file, so they cannot hold path separators
+CAMPAIGN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,99}")
+
+# Host header values of requests to the TCP server (DNS rebinding protection)
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+class JobStore:
+    """
+    Thread-safe registry of the jobs submitted to the daemon and their progress
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.next_id = 1
+
+    def create(self, spec):
+        with self.lock:
+            job_id = str(self.next_id)
+            self.next_id += 1
+            self.jobs[job_id] = {
+                "id": job_id,
+                "state": "queued",
+                "spec": spec,
+                "total": 0,
+                "sent": 0,
+                "failed": 0,
+                "skipped": {},
+                "error": None,
+                "created": _now(),
+                "finished": None,
+            }
+            return dict(self.jobs[job_id])
+
+    def queued(self, job_id, total, skipped=None):
+        """
+        Set the number of messages queued for a job (a job with none is done at once)
+        """
+        with self.lock:
+            job = self.jobs[job_id]
+            job["total"] = total
+            job["skipped"] = skipped or {}
+            if total == 0:
+                job["state"] = "done"
+                job["finished"] = _now()
+
+    def record(self, job_id, success):
+        """
+        Count one send of a job
+
+        Returns:
+            bool: True if this was the last message of the job
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            job["sent" if success else "failed"] += 1
+            job["state"] = "running"
+            if job["sent"] + job["failed"] >= job["total"]:
+                job["state"] = "done"
+                job["finished"] = _now()
+                return True
+            return False
+
+    def fail(self, job_id, error):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["state"] = "failed"
+            job["error"] = error
+            job["finished"] = _now()
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def counts(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["state"]] = counts.get(job["state"], 0) + 1
+            return counts
+
+
+def validate_job(spec):
+    """
+    Check the types of the job fields
+
+    Raises:
+        ValueError: If the job is not a JSON object or a field has the wrong type
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Job must be a JSON object")
+    for field, types in JOB_FIELDS.items():
+        value = spec.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+            raise ValueError(f"Field '{field}' has the wrong type")
+    if spec.get("campaign") is not None and not CAMPAIGN_PATTERN.fullmatch(spec["campaign"]):
+        raise ValueError("Field 'campaign' may only hold letters, digits, '.', '_' and '-'")
+    for column, variable in (spec.get("map") or {}).items():
+        if not isinstance(variable, str):
+            raise ValueError(f"Field 'map' must map column names to variable names, got '{column}': {variable!r}")
+    for name, value in (spec.get("variables") or {}).items():
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"Variable '{name}' must be a text or a number")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP routes of the job API; the server provides jobs, submit_job and health
+    """
+
+    def refused(self):
+        """
+        Answer requests that may come from a web page with 403
+
+        Returns:
+            bool: True if the request was refused
+        """
+        host = self.headers.get("Host") or ""
+        if not host.endswith("]"):
+            host = host.rsplit(":", 1)[0]
+        if self.headers.get("Origin") is not None:
+            self.send_json(403, {"error": "Requests from web pages are not accepted"})
+            return True
+        if self.server.local_hosts is not None and host not in self.server.local_hosts:
+            self.send_json(403, {"error": f"Host '{self.headers.get('Host')}' is not accepted"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.refused():
+            return
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self.send_json(200, {**self.server.health(), "jobs": self.server.jobs.counts()})
+        elif path == "/jobs":
+            self.send_json(200, self.server.jobs.list())
+        elif path.startswith("/jobs/"):
+            job = self.server.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                self.send_json(404, {"error": "Job not found"})
+            else:
+                self.send_json(200, job)
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.refused():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            self.send_json(404, {"error": "Not found"})
+            return
+        if (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower() != "application/json":
+            self.send_json(415, {"error": "Jobs must be sent with Content-Type: application/json"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            spec = json.loads(self.rfile.read(length) or b"{}")
+            validate_job(spec)
+        except ValueError as e:
+            self.send_json(400, {"error": f"Invalid job: {e}"})
+            return
+
+        job = self.server.jobs.create(spec)
+        try:
+            self.server.submit_job(job["id"], spec)
+        except RuntimeError as e:
+            self.server.jobs.fail(job["id"], str(e))
+            self.send_json(503, self.server.jobs.get(job["id"]))
+            return
+        except Exception as e:
+            # Whatever the job did wrong, it must not stay queued without an answer
+            self.server.jobs.fail(job["id"], str(e) or type(e).__name__)
+            self.send_json(400, self.server.jobs.get(job["id"]))
+            return
+        self.send_json(202, self.server.jobs.get(job["id"]))
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def start_server(jobs, submit_job, health, host="127.0.0.1", port=DEFAULT_PORT, socket_path=None):
+    """
+    Create the job API server (call serve_forever() on it)
+
+    Parameters:
+        jobs (JobStore): Job registry
+        submit_job (callable): submit_job(job_id, spec) queues the messages of a job and
+            calls jobs.queued(); raises RuntimeError if no sender runs, any other error rejects the job
+        health (callable): Returns a dict with the sender status
+        host (str): Address to listen on (localhost by default); requests must also
+            name it, or localhost, as Host
+        port (int): TCP port
+        socket_path (str): Listen on this Unix socket instead of TCP
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, JobRequestHandler)
+        os.chmod(socket_path, 0o600)
+        server.local_hosts = None
+    else:
+        server = ThreadingHTTPServer((host, port), JobRequestHandler)
+        server.local_hosts = LOCAL_HOSTS + (host,)
+
+    server.jobs = jobs
+    server.submit_job = submit_job
+    server.health = health
+    return server
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
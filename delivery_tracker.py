@@ -0,0 +1,117 @@
+"""
+Delivery Tracker
+
+Tracks the status of every sent message without blocking the send loop.
+The status of the outgoing bubble is read once right after sending; messages
+still pending are checked later from the chat list, which shows the status
+icon (clock, single or double tick) of the last message in each chat.
+
+A WebDriver session cannot be used from two threads at once, so checks run
+between contacts (one in-page snapshot of the chat list) and once more at
+the end of the run.
+
+Usage:
+    from delivery_tracker import DeliveryTracker
+
+    tracker = DeliveryTracker()
+    tracker.track("+51987654321", "Juan", "msg-time")
+    tracker.update(driver)               # between contacts
+    tracker.finalize(driver, timeout=30) # end of the run
+    tracker.counts()                     # {'confirmed': 1, 'pending': 0, 'failed': 0}
+"""
+
+import re
+import time
+
+
+ICON_STATUS = {
+    "msg-time": "pending",
+    "status-time": "pending",
+    "msg-check": "sent",
+    "status-check": "sent",
+    "msg-dblcheck": "delivered",
+    "status-dblcheck": "delivered",
+    "msg-dblcheck-ack": "read",
+    "status-dblcheck-ack": "read",
+    "msg-error": "failed",
+    "status-alert": "failed",
+    "alert-notification": "failed",
+}
+
+CONFIRMED_STATUSES = ("sent", "delivered", "read")
+
+CHAT_LIST_STATUS_SCRIPT = """
+const rows = document.querySelectorAll("#pane-side div[role='listitem'], div[data-testid='chat-list'] div[role='listitem']");
+const snapshot = [];
+for (const row of rows) {
+    const title = row.querySelector("span[title]");
+    const icon = row.querySelector("span[data-icon^='status-'], span[data-icon^='msg-'], span[data-icon='alert-notification']");
+    if (icon) {
+        snapshot.push([title ? title.getAttribute('title') : (row.textContent || ''), icon.getAttribute('data-icon')]);
+    }
+}
+return snapshot;
+"""
+
+
+def icon_status(icon):
+    """
+    Map a WhatsApp status icon name to pending/sent/delivered/read/failed
+    """
+    return ICON_STATUS.get(icon or "", "pending")
+
+
+class DeliveryTracker:
+    """
+    Delivery status of the messages sent in this run, keyed by number
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def track(self, numero, nombre, icon=None):
+        self.records[numero] = {"nombre": nombre, "status": icon_status(icon), "sent_at": time.time()}
+
+    def pending(self):
+        return [numero for numero, record in self.records.items() if record["status"] == "pending"]
+
+    def update(self, driver):
+        """
+        Refresh pending messages from one snapshot of the chat list
+
+        Returns:
+            int: Number of messages still pending
+        """
+        pending = self.pending()
+        if not pending:
+            return 0
+
+        snapshot = driver.execute_script(CHAT_LIST_STATUS_SCRIPT) or []
+        rows = [(re.sub(r"\D", "", title or ""), title, icon) for title, icon in snapshot]
+
+        for numero in pending:
+            record = self.records[numero]
+            digits = re.sub(r"\D", "", numero)
+            for title_digits, title, icon in rows:
+                if (title_digits and title_digits == digits) or title == record["nombre"]:
+                    record["status"] = icon_status(icon)
+                    break
+
+        return len(self.pending())
+
+    def finalize(self, driver, timeout=30, poll=2):
+        """
+        Keep checking the chat list until nothing is pending or the timeout expires
+        """
+        deadline = time.time() + timeout
+        while self.update(driver) and time.time() < deadline:
+            time.sleep(poll)
+
+    def counts(self):
+        counts = {"confirmed": 0, "pending": 0, "failed": 0}
+        for record in self.records.values():
+            if record["status"] in CONFIRMED_STATUSES:
+                counts["confirmed"] += 1
+            else:
+                counts[record["status"]] += 1
+        return counts
@@ -0,0 +1,255 @@
+"""
+Run History
+
+Local history of past runs: how many contacts were sent, failed or had an
+invalid number, how many workers sent them, how long it took and the mean
+time per contact. It is used to forecast new campaigns (duration, expected
+failures and throughput) before they are sent, and for the ETA shown while
+a campaign runs.
+
+The history is a JSON file with one entry per run; only the most recent
+runs are kept. The time and outcome of each contact come from the result
+records of past runs (see result_log.py), so the forecast also knows how
+long sent, failed and invalid contacts take and how slow the slowest sends
+are.
+
+Usage:
+    from history import RunHistory, format_duration
+
+    history = RunHistory()
+    history.load()
+    history.load_contacts("wasapy_results.jsonl")
+    plan = history.forecast(1200, workers=2, max_rate=20, max_per_hour=300)
+    print(format_duration(plan["seconds"]))
+    history.add(campaign="october", contacts=100, sent=95, failed=3, invalid=2,
+                workers=1, elapsed=1260.0, contact_mean=8.4)
+    history.save()
+"""
+
+import os
+import json
+import math
+from datetime import datetime
+
+
+DEFAULT_HISTORY_PATH = "wasapy_history.json"
+
+# Assumed time per contact when there is no history yet
+DEFAULT_CONTACT_SECONDS = 10.0
+
+# Final outcomes of a contact in the result records
+CONTACT_OUTCOMES = ("sent", "failed", "invalid")
+
+
+class RunHistory:
+    """
+    Outcomes and timings of past runs, most recent last
+
+    Parameters:
+        path (str): JSON file where the runs are persisted
+        max_runs (int): Runs kept in the file
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, max_runs=100):
+        self.path = path
+        self.max_runs = max_runs
+        self.runs = []
+        self.contact_times = {}
+
+    def load(self):
+        self.runs = []
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                runs = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(runs, list):
+            self.runs = runs[-self.max_runs:]
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.runs[-self.max_runs:], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def load_contacts(self, results_path, limit=5000):
+        """
+        Load the time and outcome of the most recent contacts from a result
+        records file; the time of a contact is the sum of its send phases
+        """
+        self.contact_times = {}
+        for record in read_last_records(results_path, limit):
+            outcome = record.get("outcome")
+            durations = record.get("durations")
+            if outcome in CONTACT_OUTCOMES and isinstance(durations, dict):
+                self.contact_times.setdefault(outcome, []).append(sum(durations.values()))
+
+    def add(self, contacts, sent, failed, invalid, workers, elapsed, contact_mean, **fields):
+        """
+        Record one finished run (runs without contacts are not recorded)
+
+        Parameters:
+            contacts (int): Contacts processed
+            sent (int): Messages sent
+            failed (int): Contacts that failed for other reasons than an invalid number
+            invalid (int): Contacts whose number is not on WhatsApp
+            workers (int): Browser sessions that sent the run
+            elapsed (float): Seconds from the first send to the end of the run
+            contact_mean (float): Mean seconds per contact, pacing excluded
+            **fields: Other fields stored with the run (e.g. campaign)
+        """
+        if contacts <= 0 or elapsed <= 0:
+            return
+        self.runs.append({
+            "date": datetime.now().isoformat(timespec="seconds"),
+            **fields,
+            "contacts": contacts,
+            "sent": sent,
+            "failed": failed,
+            "invalid": invalid,
+            "workers": workers,
+            "elapsed": round(elapsed, 1),
+            "contact_mean": round(contact_mean, 2),
+        })
+        self.runs = self.runs[-self.max_runs:]
+
+    def stats(self, recent=20):
+        """
+        Totals of the most recent runs
+
+        Returns:
+            dict: runs, contacts, failure and invalid ratios, mean seconds per
+            contact and messages per minute per worker, or None without history.
+            With contact times loaded, also the median and 90th percentile of
+            the seconds per contact and the mean seconds per outcome
+        """
+        runs = self.runs[-recent:]
+        contacts = sum(run["contacts"] for run in runs)
+        worker_minutes = sum(run["elapsed"] * run["workers"] for run in runs) / 60
+        if not contacts or not worker_minutes:
+            return None
+
+        stats = {
+            "runs": len(runs),
+            "contacts": contacts,
+            "failed_ratio": sum(run["failed"] for run in runs) / contacts,
+            "invalid_ratio": sum(run["invalid"] for run in runs) / contacts,
+            "contact_mean": sum(run["contact_mean"] * run["contacts"] for run in runs) / contacts,
+            "rate_per_worker": contacts / worker_minutes,
+        }
+        times = sorted(seconds for values in self.contact_times.values() for seconds in values)
+        if times:
+            stats["contact_mean"] = sum(times) / len(times)
+            stats["contact_p50"] = percentile(times, 0.5)
+            stats["contact_p90"] = percentile(times, 0.9)
+            stats["outcome_means"] = {outcome: sum(values) / len(values) for outcome, values in self.contact_times.items()}
+        return stats
+
+    def forecast(self, contacts, workers=1, max_rate=None, max_per_hour=None):
+        """
+        Expected duration and outcomes of a campaign
+
+        The rate per worker is the one measured in past runs, limited by the
+        pacing limits of the new campaign (max_rate per minute, max_per_hour).
+        With contact times loaded, the slow case assumes every send takes as
+        long as the 90th percentile of past sends instead of the mean.
+
+        Returns:
+            dict: seconds, seconds_slow, rate (messages/minute, all workers),
+            expected sent, failed and invalid contacts, the contact time stats
+            (see stats(), None without history) and the number of runs it is
+            based on
+        """
+        stats = self.stats()
+        if stats:
+            rate = stats["rate_per_worker"]
+            failed_ratio, invalid_ratio = stats["failed_ratio"], stats["invalid_ratio"]
+        else:
+            rate = 60 / DEFAULT_CONTACT_SECONDS
+            failed_ratio = invalid_ratio = 0.0
+        slow_rate = rate
+        if stats and "contact_p90" in stats:
+            # Same pauses and overhead per contact, with the send itself taking the p90 time
+            slow_rate = 60 / (max(0.0, 60 / rate - stats["contact_mean"]) + stats["contact_p90"])
+
+        limits = [limit for limit in (max_rate, max_per_hour / 60 if max_per_hour else None) if limit]
+        rate = min([rate] + limits) * max(1, workers)
+        slow_rate = min([slow_rate] + limits) * max(1, workers)
+
+        failed = round(contacts * failed_ratio)
+        invalid = round(contacts * invalid_ratio)
+        return {
+            "seconds": contacts / rate * 60 if contacts else 0.0,
+            "seconds_slow": contacts / slow_rate * 60 if contacts else 0.0,
+            "rate": rate,
+            "sent": contacts - failed - invalid,
+            "failed": failed,
+            "invalid": invalid,
+            "contact_times": stats if stats and "contact_p90" in stats else None,
+            "based_on": stats["runs"] if stats else 0,
+        }
+
+
+def read_last_records(path, limit):
+    """
+    The last limit records of a JSONL file, read from its end so a long
+    result file is not read whole; missing files and bad lines are skipped
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = 1024 * limit
+            f.seek(max(0, size - block))
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    if size > block:
+        lines = lines[1:]
+
+    records = []
+    for line in lines[-limit:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of sorted values
+    """
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def estimate_remaining(done, total, elapsed):
+    """
+    Seconds left for the remaining contacts at the rate of the current run
+    (None before the first contact)
+    """
+    if done <= 0 or elapsed <= 0:
+        return None
+    return max(0, total - done) * elapsed / done
+
+
+def format_duration(seconds):
+    """
+    Short human-readable duration, e.g. "2 h 05 min", "12 min 30 s"
+    """
+    if seconds is None:
+        return "unknown"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} h {minutes:02d} min"
+    if minutes:
+        return f"{minutes} min {seconds:02d} s"
+    return f"{seconds} s"
@@ -0,0 +1,123 @@
+"""
+Media Cache
+
+Prepares the files attached to messages once per campaign. Images are
+downscaled and recompressed for WhatsApp, which recompresses them anyway,
+so every contact uploads a small file instead of the original. Results are
+cached on disk by content hash, so later sends and later runs reuse the
+optimized file. Other files (PDFs, documents) are sent as they are.
+
+Image processing needs Pillow (pip install Pillow); without it images are
+sent unchanged.
+
+Usage:
+    from media import MediaCache
+
+    media = MediaCache()
+    path = media.prepare("media/flyer.png")   # absolute path of the file to upload
+    media.is_image(path)                      # True: send as photo, False: as document
+"""
+
+import os
+import hashlib
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+DEFAULT_MEDIA_DIR = ".wasapy_media"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+class MediaCache:
+    """
+    Optimized copies of the attachments, keyed by content hash
+
+    Parameters:
+        directory (str): Cache directory
+        max_side (int): Longest image side in pixels after resizing
+        quality (int): JPEG quality of recompressed images
+    """
+
+    def __init__(self, directory=DEFAULT_MEDIA_DIR, max_side=1600, quality=80):
+        self.directory = directory
+        self.max_side = max_side
+        self.quality = quality
+        self.prepared = {}
+        self.stats = {"optimized": 0, "cached": 0, "unchanged": 0}
+
+    @staticmethod
+    def is_image(path):
+        return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+    def prepare(self, path):
+        """
+        Return the file to upload for an attachment
+
+        Raises:
+            OSError: If the attachment cannot be read
+        """
+        path = os.path.abspath(path)
+        status = os.stat(path)
+        key = (path, status.st_size, status.st_mtime)
+        if key in self.prepared:
+            return self.prepared[key]
+
+        prepared = path
+        if Image is not None and self.is_image(path):
+            prepared = self._optimize(path)
+        else:
+            self.stats["unchanged"] += 1
+
+        self.prepared[key] = prepared
+        return prepared
+
+    def _optimize(self, path):
+        digest = _file_digest(path)
+        name = f"{digest[:32]}-{self.max_side}-q{self.quality}"
+        for suffix in (".jpg", ".png"):
+            cached = os.path.join(os.path.abspath(self.directory), name + suffix)
+            if os.path.exists(cached):
+                self.stats["cached"] += 1
+                return cached
+
+        try:
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.max_side, self.max_side))
+                if "A" in image.getbands() or "transparency" in image.info:
+                    suffix, image_format, options = ".png", "PNG", {"optimize": True}
+                else:
+                    image = image.convert("RGB")
+                    suffix, image_format, options = ".jpg", "JPEG", {"quality": self.quality, "optimize": True}
+                os.makedirs(self.directory, exist_ok=True)
+                cached = os.path.join(os.path.abspath(self.directory), name + suffix)
+                tmp_path = f"{cached}.tmp"
+                image.save(tmp_path, format=image_format, **options)
+        except (OSError, ValueError):
+            # Not a readable image: upload the original
+            self.stats["unchanged"] += 1
+            return path
+
+        same_format = os.path.splitext(path)[1].lower() in ((".jpg", ".jpeg") if suffix == ".jpg" else (".png",))
+        if same_format and os.path.getsize(tmp_path) >= os.path.getsize(path):
+            # Already small: keep the original bytes under the cache name
+            with open(path, "rb") as source, open(tmp_path, "wb") as target:
+                target.write(source.read())
+        os.replace(tmp_path, cached)
+        self.stats["optimized"] += 1
+        return cached
+
+    def summary_line(self):
+        return f"Attachments: {self.stats['optimized']} optimized, {self.stats['cached']} from cache, {self.stats['unchanged']} sent as is"
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
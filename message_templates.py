@@ -9,6 +9,13 @@ Template functions should:
 - Use .format() or f-strings for variable substitution
 - Return a string with the complete message
 
+List the template variables in TEMPLATE_FIELDS so CSV files can be checked
+before sending. CSV columns are passed to the template by their lowercased name.
+
+A file (image or document) can be sent with every message of a template by
+adding it to TEMPLATE_ATTACHMENTS; the message is then sent as its caption.
+An "Adjunto" CSV column sets the file per contact.
+
 Usage:
     from message_templates import get_message_template
     
@@ -16,6 +23,8 @@ Usage:
     message = get_message_template("custom_template", nombre="María", empresa="Tech Corp")
 """
 
+import os
+
 
 def default_template(**kwargs):
     """
@@ -141,14 +150,49 @@ Tu colaboración es muy importante para nosotros.
 ¡Muchas gracias!"""
 
 
+def csv_message_template(**kwargs):
+    """
+    Sends the text of the "Mensaje" CSV column as is
+    
+    Parameters:
+        mensaje (str): Message text for this contact
+    
+    Returns:
+        str: Formatted message
+    """
+    return kwargs.get('mensaje', '').strip()
+
+
 AVAILABLE_TEMPLATES = {
     "default": default_template,
     "promotional": promotional_template,
     "event_invitation": event_invitation_template,
     "followup": followup_template,
     "thankyou": thankyou_template,
+    "csv_message": csv_message_template,
 }
 
+# Variables each template uses. Variables not listed in REQUIRED_FIELDS fall
+# back to the template default when the CSV does not provide them.
+TEMPLATE_FIELDS = {
+    "default": ["nombre"],
+    "promotional": ["nombre", "producto", "descuento"],
+    "event_invitation": ["nombre", "evento", "fecha", "lugar"],
+    "followup": ["nombre"],
+    "thankyou": ["nombre", "motivo"],
+    "csv_message": ["mensaje"],
+}
+
+REQUIRED_FIELDS = {
+    "csv_message": ["mensaje"],
+}
+
+# File sent with every message of a template, e.g. "promotional": "media/flyer.jpg"
+TEMPLATE_ATTACHMENTS = {}
+
+# Template variable (CSV column "Adjunto") with the file to send to one contact
+ATTACHMENT_FIELD = "adjunto"
+
 
 def get_message_template(template_name="default", **kwargs):
     """
@@ -178,6 +222,114 @@ def get_message_template(template_name="default", **kwargs):
     return template_func(**kwargs)
 
 
+class CompiledTemplate:
+    """
+    Template resolved once per campaign and bound to a CSV column mapping
+    
+    CSV columns become template variables by their lowercased name
+    ("Nombre" -> nombre, "Mensaje" -> mensaje) unless column_map maps them
+    to another variable. Empty values are left out so template defaults apply.
+    
+    Parameters:
+        template_name (str): Name of the template to use
+        column_map (dict): CSV column name -> template variable name
+        attachment (str): File sent with every message, instead of the one in TEMPLATE_ATTACHMENTS
+    
+    Raises:
+        ValueError: If template_name doesn't exist
+    
+    Example:
+        >>> template = CompiledTemplate("promotional", {"Oferta": "descuento"})
+        >>> errors, warnings = template.validate(reader.fieldnames, enumerate(reader, 1))
+        >>> msg = template.render({"Nombre": "María", "Oferta": "20%"})
+        >>> path = template.attachment({"Nombre": "María", "Adjunto": "media/maria.pdf"})
+    """
+    
+    def __init__(self, template_name="default", column_map=None, attachment=None):
+        if template_name not in AVAILABLE_TEMPLATES:
+            raise ValueError(
+                f"Template '{template_name}' not found. "
+                f"Available templates: {', '.join(AVAILABLE_TEMPLATES.keys())}"
+            )
+        
+        self.name = template_name
+        self.func = AVAILABLE_TEMPLATES[template_name]
+        self.fields = TEMPLATE_FIELDS.get(template_name, ["nombre"])
+        self.required = REQUIRED_FIELDS.get(template_name, [])
+        self.column_map = column_map or {}
+        self.default_attachment = attachment or TEMPLATE_ATTACHMENTS.get(template_name)
+    
+    def variable_name(self, column):
+        return self.column_map.get(column, column.strip().lower())
+    
+    def variables(self, row):
+        variables = {}
+        for column, value in row.items():
+            if column is None or value is None or not value.strip():
+                continue
+            variables[self.variable_name(column)] = value.strip()
+        return variables
+    
+    def render(self, row):
+        """
+        Render the message for one CSV row (dict of column -> value)
+        """
+        return self.func(**self.variables(row))
+    
+    def attachment(self, row):
+        """
+        File to send with the message of one CSV row, or None
+        """
+        return self.variables(row).get(ATTACHMENT_FIELD) or self.default_attachment
+    
+    def validate(self, fieldnames, rows):
+        """
+        Check a whole CSV file against the template before sending
+        
+        Parameters:
+            fieldnames (list): CSV header
+            rows (iterable): (row_num, row) pairs
+        
+        Returns:
+            tuple: (errors, warnings) as lists of strings
+        """
+        errors = []
+        warnings = []
+        provided = {self.variable_name(column) for column in fieldnames or []}
+        
+        for field in self.fields:
+            if field in provided:
+                continue
+            if field in self.required:
+                errors.append(f"Template '{self.name}' needs '{field}' but no CSV column provides it")
+            else:
+                warnings.append(f"No CSV column for '{field}', the template default will be used")
+        
+        if self.default_attachment and not os.path.isfile(self.default_attachment):
+            errors.append(f"Attachment not found: {self.default_attachment}")
+        
+        if errors:
+            return errors, warnings
+        
+        for row_num, row in rows:
+            variables = self.variables(row)
+            missing = [field for field in self.required if field not in variables]
+            if missing:
+                errors.append(f"Row {row_num}: missing {', '.join(missing)}")
+                continue
+            attachment = variables.get(ATTACHMENT_FIELD)
+            if attachment and not os.path.isfile(attachment):
+                errors.append(f"Row {row_num}: attachment not found: {attachment}")
+                continue
+            try:
+                if not self.func(**variables).strip() and not (attachment or self.default_attachment):
+                    errors.append(f"Row {row_num}: rendered message is empty")
+            except Exception as e:
+                errors.append(f"Row {row_num}: {type(e).__name__}: {e}")
+        
+        return errors, warnings
+
+
 def list_templates():
     """
     List all available templates
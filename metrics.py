@@ -0,0 +1,209 @@
+"""
+Send Metrics
+
+Per-phase latency histograms and event counters for the send path, exported
+at the end of a run as JSON and in the Prometheus textfile collector format.
+
+Usage:
+    from metrics import SendMetrics
+
+    metrics = SendMetrics()
+    clock = metrics.clock()
+    ...                       # open the chat
+    clock.mark("open_chat")   # time since the clock started
+    ...                       # write the message
+    clock.mark("compose")     # time since the previous mark
+    metrics.increment("retries")
+    metrics.write_json("wasapy_metrics.json")
+    metrics.write_prometheus("/var/lib/node_exporter/wasapy.prom", campaign="october")
+"""
+
+import os
+import json
+import time
+from contextlib import contextmanager
+
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, fraction):
+        """
+        Upper bound of the bucket holding the given quantile (max for the last bucket)
+        """
+        if self.count == 0:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "max": round(self.max, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "buckets": list(BUCKETS),
+            "counts": list(self.counts),
+        }
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data["counts"])]
+        self.count += data["count"]
+        self.sum += data["sum"]
+        self.max = max(self.max, data["max"])
+
+
+class PhaseClock:
+    """
+    Lap timer: each mark() records the time since the previous mark under a phase name
+
+    If a laps dict is given, the durations are also added up in it per phase.
+    """
+
+    def __init__(self, metrics, laps=None):
+        self.metrics = metrics
+        self.laps = laps
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.metrics.observe(phase, now - self.last)
+        if self.laps is not None:
+            self.laps[phase] = self.laps.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+class SendMetrics:
+    """
+    Histograms per phase and counters per event for one process
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, phase, seconds):
+        self.histograms.setdefault(phase, Histogram()).observe(seconds)
+
+    def increment(self, event, value=1):
+        self.counters[event] = self.counters.get(event, 0) + value
+
+    def clock(self, laps=None):
+        return PhaseClock(self, laps)
+
+    @contextmanager
+    def span(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def to_dict(self):
+        return {
+            "phases": {phase: histogram.to_dict() for phase, histogram in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def merge(self, data):
+        """
+        Add the metrics of another process (e.g. a pool worker), as returned by to_dict()
+        """
+        for phase, histogram in data["phases"].items():
+            self.histograms.setdefault(phase, Histogram()).merge(histogram)
+        for event, value in data["counters"].items():
+            self.increment(event, value)
+
+    def summary_lines(self):
+        """
+        Returns:
+            list: One line per phase with call count, mean, p90 and max
+        """
+        lines = []
+        for phase, histogram in sorted(self.histograms.items()):
+            lines.append(
+                f"{phase}: {histogram.count} calls, "
+                f"mean {histogram.sum / histogram.count * 1000:.0f} ms, "
+                f"p90 <= {histogram.quantile(0.9) * 1000:.0f} ms, "
+                f"max {histogram.max * 1000:.0f} ms"
+            )
+        return lines
+
+    def write_json(self, path, **labels):
+        data = {"labels": labels, **self.to_dict()}
+        _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path, **labels):
+        """
+        Write the metrics in the Prometheus text format, for node_exporter's textfile collector
+        """
+        lines = [
+            "# HELP wasapy_phase_duration_seconds Duration of each phase of the send path",
+            "# TYPE wasapy_phase_duration_seconds histogram",
+        ]
+        for phase, histogram in sorted(self.histograms.items()):
+            phase_labels = _format_labels({**labels, "phase": phase})
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'wasapy_phase_duration_seconds_bucket{_format_labels({**labels, "phase": phase, "le": bound})} {cumulative}')
+            lines.append(f'wasapy_phase_duration_seconds_bucket{_format_labels({**labels, "phase": phase, "le": "+Inf"})} {histogram.count}')
+            lines.append(f"wasapy_phase_duration_seconds_sum{phase_labels} {histogram.sum:.6f}")
+            lines.append(f"wasapy_phase_duration_seconds_count{phase_labels} {histogram.count}")
+
+        lines.append("# HELP wasapy_events_total Send path events (attempts, retries, errors, resets)")
+        lines.append("# TYPE wasapy_events_total counter")
+        for event, value in sorted(self.counters.items()):
+            lines.append(f"wasapy_events_total{_format_labels({**labels, 'event': event})} {value}")
+
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _write_atomic(path, content):
+    # The textfile collector may read the file at any time, so never expose a partial write
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
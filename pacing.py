@@ -0,0 +1,123 @@
+"""
+Send Pacing
+
+Adaptive send rate for the bot: a token bucket whose rate follows
+additive-increase/multiplicative-decrease (AIMD). Every quick successful
+send raises the rate by a fixed step up to the maximum; every timeout,
+browser error or unexpected state cuts it by a factor down to the minimum.
+An optional per-hour cap limits the number of sends in any 60 minutes.
+
+Rates are in messages per minute.
+
+Usage:
+    from pacing import PacingController
+
+    pacer = PacingController(min_rate=4, max_rate=20, max_per_hour=300)
+    for contact in contacts:
+        pacer.wait()                    # blocks until the next send is allowed
+        ...                             # send
+        pacer.success(seconds)          # or pacer.failure() on errors
+        time.sleep(pacer.retry_delay(attempt))
+    pacer.wait(messages=5)              # one operation delivering 5 messages (a forward)
+"""
+
+import time
+from collections import deque
+
+
+DEFAULT_MIN_RATE = 4.0
+DEFAULT_MAX_RATE = 20.0
+MAX_RETRY_DELAY = 60.0
+
+
+class PacingController:
+    """
+    Token bucket with an AIMD-controlled refill rate and an optional hourly cap
+
+    Parameters:
+        min_rate (float): Lowest rate in messages per minute
+        max_rate (float): Highest rate in messages per minute
+        max_per_hour (int): Most sends in any 60 minutes (None for no cap)
+        increase (float): Messages per minute added after each quick success
+        decrease (float): Factor applied to the rate after each error
+        slow_send (float): Sends taking longer than this many seconds do not raise the rate
+    """
+
+    def __init__(self, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE, max_per_hour=None, increase=1.0, decrease=0.5, slow_send=15.0):
+        self.configure(min_rate, max_rate, max_per_hour, increase, decrease, slow_send)
+
+    def configure(self, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE, max_per_hour=None, increase=1.0, decrease=0.5, slow_send=15.0):
+        if min_rate <= 0 or max_rate < min_rate:
+            raise ValueError(f"Invalid send rates: min {min_rate}, max {max_rate} messages/minute")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_per_hour = max_per_hour
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_send = slow_send
+        self.rate = min_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.sent_times = deque()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate / 60)
+        self.updated = now
+        return now
+
+    def delay(self, messages=1):
+        """
+        Seconds until the next send of `messages` messages is allowed
+        """
+        now = self._refill()
+        delay = 0.0 if self.tokens >= 1 else (1 - self.tokens) * 60 / self.rate
+
+        if self.max_per_hour:
+            while self.sent_times and self.sent_times[0] <= now - 3600:
+                self.sent_times.popleft()
+            excess = len(self.sent_times) + min(messages, self.max_per_hour) - self.max_per_hour
+            if excess > 0:
+                delay = max(delay, self.sent_times[excess - 1] + 3600 - now)
+        return delay
+
+    def wait(self, messages=1):
+        """
+        Block until the next send is allowed and take its token
+
+        A send operation delivering several messages (e.g. a forward to
+        several chats) takes one token but counts all of them in the hourly cap.
+
+        Returns:
+            float: Seconds waited
+        """
+        waited = 0.0
+        delay = self.delay(messages)
+        while delay > 0:
+            time.sleep(delay)
+            waited += delay
+            delay = self.delay(messages)
+
+        self.tokens -= 1
+        now = time.monotonic()
+        self.sent_times.extend([now] * messages)
+        return waited
+
+    def success(self, seconds):
+        if seconds <= self.slow_send:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failure(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+
+    def retry_delay(self, attempt):
+        """
+        Backoff before retry number `attempt`: the current send interval, doubled for each retry
+        """
+        return min(MAX_RETRY_DELAY, 60 / self.rate * 2 ** (attempt - 1))
+
+    def summary_line(self):
+        cap = f", at most {self.max_per_hour}/hour" if self.max_per_hour else ""
+        return f"Send rate: {self.rate:.1f} messages/minute (range {self.min_rate:g}-{self.max_rate:g}{cap})"
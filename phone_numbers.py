@@ -0,0 +1,144 @@
+"""
+Phone Numbers
+
+Normalization and filtering of CSV phone numbers before the browser runs:
+numbers are converted to one canonical international form, duplicates are
+dropped, and numbers WhatsApp reported as invalid in earlier campaigns are
+skipped without any browser work.
+
+Usage:
+    from phone_numbers import normalize_number, NumberFilter, InvalidNumberCache
+
+    normalize_number("987 654 321")     # '+51987654321'
+    normalize_number("0051987654321")   # '+51987654321'
+
+    invalid_numbers = InvalidNumberCache()
+    number_filter = NumberFilter(invalid_numbers, country_code="51")
+    for row_num, numero, nombre, row in number_filter.filter(contacts):
+        ...
+"""
+
+import os
+import re
+from datetime import datetime
+
+
+DEFAULT_COUNTRY_CODE = "51"
+DEFAULT_INVALID_CACHE_PATH = "invalid_numbers.txt"
+
+# Numbers up to this many digits (without a + or 00 prefix) are treated as
+# national numbers and get the default country code
+NATIONAL_MAX_LENGTH = 10
+MIN_LENGTH = 8
+MAX_LENGTH = 15
+
+
+def normalize_number(raw, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Convert a phone number to the canonical form "+<country code><number>"
+
+    Parameters:
+        raw (str): Number as written in the CSV (spaces, dashes, +, 00 or leading zeros)
+        country_code (str): Country code added to national numbers
+
+    Returns:
+        str: Canonical number, or None if it cannot be a valid phone number
+    """
+    if raw is None:
+        return None
+
+    raw = raw.strip()
+    digits = re.sub(r"\D", "", raw)
+
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        digits = digits.lstrip("0")
+        if len(digits) <= NATIONAL_MAX_LENGTH:
+            digits = country_code + digits
+
+    if not MIN_LENGTH <= len(digits) <= MAX_LENGTH:
+        return None
+    return f"+{digits}"
+
+
+class InvalidNumberCache:
+    """
+    Numbers WhatsApp reported as invalid, kept in an append-only text file
+
+    Each line holds a canonical number and the date it was found invalid.
+    Lines are appended as soon as a number is found invalid, so the cache
+    survives crashes and can be shared by pool workers.
+
+    Parameters:
+        path (str): Cache file
+    """
+
+    def __init__(self, path=DEFAULT_INVALID_CACHE_PATH):
+        self.path = path
+        self.numbers = set()
+
+    def load(self):
+        # Swapped in at once, so a reload does not empty the cache for other threads
+        numbers = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    numero = line.split("\t", 1)[0].strip()
+                    if numero:
+                        numbers.add(numero)
+        self.numbers = numbers
+
+    def add(self, numero):
+        if numero in self.numbers:
+            return
+        self.numbers.add(numero)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"{numero}\t{datetime.now().isoformat(timespec='seconds')}\n")
+
+    def __contains__(self, numero):
+        return numero in self.numbers
+
+
+class NumberFilter:
+    """
+    Streaming pre-pass over the contacts: normalizes numbers, drops
+    duplicates, malformed numbers and numbers known to be invalid
+
+    Contacts are tuples starting with (row_num, numero, ...); the number is
+    replaced by its canonical form. Skipped rows are counted in self.skipped.
+
+    Parameters:
+        invalid_numbers (InvalidNumberCache): Numbers to skip
+        country_code (str): Country code added to national numbers
+        logger: Logger for skipped rows (optional)
+    """
+
+    def __init__(self, invalid_numbers=None, country_code=DEFAULT_COUNTRY_CODE, logger=None):
+        self.invalid_numbers = invalid_numbers if invalid_numbers is not None else set()
+        self.country_code = country_code
+        self.logger = logger
+        self.seen = set()
+        self.skipped = {"malformed number": 0, "duplicate number": 0, "known invalid number": 0}
+
+    def filter(self, contacts):
+        for contact in contacts:
+            row_num, raw = contact[0], contact[1]
+            numero = normalize_number(raw, self.country_code)
+
+            if numero is None:
+                reason = "malformed number"
+            elif numero in self.seen:
+                reason = "duplicate number"
+            elif numero in self.invalid_numbers:
+                reason = "known invalid number"
+            else:
+                self.seen.add(numero)
+                yield (row_num, numero) + tuple(contact[2:])
+                continue
+
+            self.skipped[reason] += 1
+            if self.logger is not None:
+                self.logger.warning("ROW %s - %s: '%s' - SKIPPING", row_num, reason.capitalize(), raw)
@@ -0,0 +1,256 @@
+"""
+Reply Collector
+
+Collects the replies of the contacts of a campaign from WhatsApp Web. The
+chat list is read with one in-page snapshot per scroll page; only unread
+chats of campaign contacts are opened, and only the incoming messages after
+the last one collected for that contact (its high-water mark) are written.
+Marks are persisted between runs, so repeated collection stays cheap. If
+the marked message is no longer rendered (WhatsApp only renders the latest
+messages of a chat), only messages with a later time than the mark are
+written.
+
+Chats are matched to contacts by number (unsaved contacts show the number
+as chat title) or by the contact name from the campaign file.
+
+Replies are appended to a JSONL file, or to a CSV file if the path ends
+with .csv.
+
+Usage:
+    from replies import ReplyCollector, ReplyWriter
+
+    collector = ReplyCollector({"+51987654321": "Juan"})
+    collector.load()
+    for numero, nombre, unread in collector.scan(driver):
+        ...                                        # open the chat
+        records = collector.read_chat(driver, numero)
+    ReplyWriter("wasapy_replies.jsonl").write(records, campaign="october")
+    collector.save()
+"""
+
+import os
+import re
+import csv
+import json
+import time
+from datetime import datetime
+
+
+DEFAULT_REPLIES_PATH = "wasapy_replies.jsonl"
+DEFAULT_STATE_PATH = "replies_state.json"
+
+REPLY_FIELDS = ["collected", "campaign", "numero", "nombre", "message_id", "sent", "text"]
+
+# Time of a message as shown by WhatsApp, e.g. "10:32, 17/10/2025" or "10:32 p. m., 17/10/2025"
+MESSAGE_TIME = re.compile(r"(\d{1,2}):(\d{2})\s*([ap])?[^,]*,\s*(\d{1,2})/(\d{1,2})/(\d{2,4})", re.IGNORECASE)
+
+# Snapshot of the visible chat list rows as [title, unread count], then scroll one page down
+CHAT_PAGE_SCRIPT = """
+const pane = document.querySelector('#pane-side');
+if (!pane) { return null; }
+if (arguments[0]) { pane.scrollTop = 0; return {rows: [], end: false}; }
+const rows = [];
+for (const row of pane.querySelectorAll("div[role='listitem']")) {
+    const title = row.querySelector("span[title]");
+    const badge = row.querySelector("span[aria-label*='no leído'], span[aria-label*='unread']");
+    rows.push([title ? title.getAttribute('title') : '', badge ? parseInt(badge.textContent, 10) || 1 : 0]);
+}
+const end = pane.scrollTop + pane.clientHeight >= pane.scrollHeight - 2;
+pane.scrollTop += pane.clientHeight;
+return {rows: rows, end: end};
+"""
+
+# Incoming messages of the open chat as [message id, "[time, date] author: ", text]
+CHAT_MESSAGES_SCRIPT = """
+const messages = [];
+for (const bubble of document.querySelectorAll("#main div.message-in")) {
+    const container = bubble.closest("div[data-id]");
+    const meta = bubble.querySelector("div[data-pre-plain-text]");
+    const text = bubble.querySelector("span.selectable-text, span[data-testid='selectable-text']");
+    messages.push([
+        container ? container.getAttribute('data-id') : null,
+        meta ? meta.getAttribute('data-pre-plain-text') : '',
+        text ? text.innerText : '',
+    ]);
+}
+return messages;
+"""
+
+
+class ReplyCollector:
+    """
+    Finds unread chats of campaign contacts and extracts their new messages
+
+    Parameters:
+        contacts (dict): Normalized number -> contact name
+        state_path (str): JSON file with the high-water mark (last message id and time) per number
+        logger: Logger for chats whose mark is no longer rendered (optional)
+    """
+
+    def __init__(self, contacts, state_path=DEFAULT_STATE_PATH, logger=None):
+        self.contacts = contacts
+        self.state_path = state_path
+        self.logger = logger
+        self.marks = {}
+        self.by_digits = {re.sub(r"\D", "", numero): numero for numero in contacts}
+        names = {}
+        for numero, nombre in contacts.items():
+            names.setdefault(nombre, []).append(numero)
+        # A name shared by several contacts cannot identify a chat
+        self.by_name = {nombre: numeros[0] for nombre, numeros in names.items() if len(numeros) == 1}
+
+    def load(self):
+        self.marks = {}
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                self.marks = json.load(f)
+        except (OSError, ValueError):
+            self.marks = {}
+
+    def save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.marks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def match(self, title):
+        """
+        Campaign number of a chat title, or None
+        """
+        digits = re.sub(r"\D", "", title or "")
+        if digits and digits in self.by_digits:
+            return self.by_digits[digits]
+        return self.by_name.get(title)
+
+    def scan(self, driver, max_pages=200, idle_pages=3, settle=0.3):
+        """
+        Walk the chat list page by page, one script call per page
+
+        The list is ordered by latest activity, so the walk stops after
+        idle_pages pages in a row without unread chats.
+
+        Returns:
+            list: (numero, nombre, unread) of campaign contacts with unread messages
+        """
+        if driver.execute_script(CHAT_PAGE_SCRIPT, True) is None:
+            return []
+        time.sleep(settle)
+
+        found = {}
+        idle = 0
+        for _ in range(max_pages):
+            page = driver.execute_script(CHAT_PAGE_SCRIPT, False)
+            if not page:
+                break
+
+            unread_rows = [(title, unread) for title, unread in page["rows"] if unread]
+            for title, unread in unread_rows:
+                numero = self.match(title)
+                if numero is not None and numero not in found:
+                    found[numero] = (numero, self.contacts[numero], unread)
+
+            idle = 0 if unread_rows else idle + 1
+            if page["end"] or idle >= idle_pages:
+                break
+            time.sleep(settle)
+
+        return list(found.values())
+
+    def read_chat(self, driver, numero):
+        """
+        New incoming messages of the open chat since the contact's high-water mark
+
+        Returns:
+            list: Reply records (dicts with REPLY_FIELDS except collected and campaign)
+        """
+        messages = [(message_id, sent_time(meta), text) for message_id, meta, text in driver.execute_script(CHAT_MESSAGES_SCRIPT) or []]
+        ids = [message_id for message_id, _, _ in messages]
+        mark = self.marks.get(numero)
+        if isinstance(mark, str):
+            # Marks of older versions hold only the message id
+            mark = {"id": mark, "sent": ""}
+
+        if not mark:
+            new = messages
+        elif mark["id"] in ids:
+            new = messages[ids.index(mark["id"]) + 1:]
+        else:
+            # The marked message scrolled out of the rendered messages: a
+            # message is only new if its time is later than the mark's
+            mark_time = message_time(mark["sent"])
+            new = [message for message in messages if mark_time is not None and (message_time(message[1]) or mark_time) > mark_time]
+            if self.logger is not None:
+                self.logger.warning("REPLIES %s - Last collected message is no longer shown, keeping %s of %s messages newer than '%s'", numero, len(new), len(messages), mark['sent'] or 'unknown')
+            # Messages of the same minute as the mark cannot be told apart and
+            # are skipped; the mark moves to the last message shown
+            for message_id, sent, _ in reversed(messages):
+                if message_id:
+                    self.marks[numero] = {"id": message_id, "sent": sent}
+                    break
+
+        records = []
+        for message_id, sent, text in new:
+            records.append({
+                "numero": numero,
+                "nombre": self.contacts[numero],
+                "message_id": message_id,
+                "sent": sent,
+                "text": text,
+            })
+            if message_id:
+                self.marks[numero] = {"id": message_id, "sent": sent}
+        return records
+
+
+def sent_time(meta):
+    """
+    Time part of a data-pre-plain-text attribute, "[10:32, 17/10/2025] Juan: " -> "10:32, 17/10/2025"
+    """
+    return meta[1:meta.index("]")] if meta.startswith("[") and "]" in meta else ""
+
+
+def message_time(sent):
+    """
+    Datetime of a message time shown by WhatsApp (day first), or None if it cannot be read
+    """
+    match = MESSAGE_TIME.search(sent or "")
+    if match is None:
+        return None
+    hour, minute, meridiem, day, month, year = match.groups()
+    hour = int(hour)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+    year = int(year) + (2000 if len(year) == 2 else 0)
+    try:
+        return datetime(year, int(month), int(day), hour, int(minute))
+    except ValueError:
+        return None
+
+
+class ReplyWriter:
+    """
+    Appends reply records to a JSONL file, or a CSV file if the path ends with .csv
+    """
+
+    def __init__(self, path=DEFAULT_REPLIES_PATH):
+        self.path = path
+
+    def write(self, records, **fields):
+        if not records:
+            return
+        collected = datetime.now().isoformat(timespec="seconds")
+        rows = [{"collected": collected, **fields, **record} for record in records]
+
+        if self.path.lower().endswith(".csv"):
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=REPLY_FIELDS, extrasaction="ignore")
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
@@ -0,0 +1,190 @@
+"""
+Browser Watchdog
+
+Watches a long-running browser session for the slow degradation of
+WhatsApp Web: every chat opened stays in the app's state, so the memory of
+the browser grows and sends get slower over thousands of contacts. The
+watchdog samples the memory of the driver process and its children (the
+browser) and compares the recent send times with those at the start of
+the session. When memory passes the limit, the sends drift too far from
+the baseline, or after a fixed number of contacts, it asks for a recycle.
+
+A recycle is a fresh WhatsApp Web tab; if the last tab recycle did not
+help, the whole browser is restarted with the same profile. Neither needs
+a new QR login.
+
+Memory is read with psutil when it is installed, otherwise from /proc on
+Linux; elsewhere only the send times are watched.
+
+Usage:
+    from resource_watchdog import ResourceWatchdog
+
+    watchdog = ResourceWatchdog(max_memory_mb=1500, max_drift=2.0)
+    for contact in contacts:
+        decision = watchdog.check(driver_pid) # None or (action, reason), action "tab" or "browser"
+        if decision:
+            ...                               # recycle
+            watchdog.recycled(decision[0])
+        ...                                   # send
+        watchdog.observe(seconds)
+"""
+
+import os
+from collections import deque
+from statistics import median
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+DEFAULT_MAX_MEMORY_MB = 1500
+DEFAULT_MAX_DRIFT = 2.0
+
+
+class ResourceWatchdog:
+    """
+    Decides when the browser session of a worker should be recycled
+
+    Parameters:
+        max_memory_mb (float): Memory of driver and browser processes that triggers a recycle (0 to disable)
+        max_drift (float): Ratio of the recent median send time to the baseline that triggers a recycle (0 to disable)
+        recycle_every (int): Recycle the tab after this many contacts (0 to disable)
+        window (int): Sends in the baseline and in the recent median
+        sample_every (int): Contacts between memory samples
+    """
+
+    def __init__(self, max_memory_mb=DEFAULT_MAX_MEMORY_MB, max_drift=DEFAULT_MAX_DRIFT, recycle_every=0, window=20, sample_every=5):
+        self.configure(max_memory_mb, max_drift, recycle_every, window, sample_every)
+
+    def configure(self, max_memory_mb=DEFAULT_MAX_MEMORY_MB, max_drift=DEFAULT_MAX_DRIFT, recycle_every=0, window=20, sample_every=5):
+        if max_memory_mb < 0 or max_drift < 0 or recycle_every < 0:
+            raise ValueError("Recycle thresholds cannot be negative")
+        if 0 < max_drift <= 1:
+            raise ValueError(f"Latency drift limit must be above 1, got {max_drift:g}")
+        self.max_memory_mb = max_memory_mb
+        self.max_drift = max_drift
+        self.recycle_every = recycle_every
+        self.window = window
+        self.sample_every = sample_every
+        self.baseline = []
+        self.recent = deque(maxlen=window)
+        self.contacts = 0
+        self.since_recycle = 0
+        self.last_action = None
+        self.memory_mb = None
+        self.recycles = {"tab": 0, "browser": 0}
+
+    def observe(self, seconds):
+        """
+        Record the time of one send, pacing excluded
+        """
+        self.contacts += 1
+        self.since_recycle += 1
+        if len(self.baseline) < self.window:
+            self.baseline.append(seconds)
+        else:
+            self.recent.append(seconds)
+
+    def drift(self):
+        """
+        Recent median send time over the baseline median, or None until both are full
+        """
+        if len(self.baseline) < self.window or len(self.recent) < self.window:
+            return None
+        baseline = median(self.baseline)
+        return median(self.recent) / baseline if baseline > 0 else None
+
+    def check(self, pid):
+        """
+        Whether to recycle before the next contact
+
+        Parameters:
+            pid (int): Driver process id; its children are the browser (None if unknown)
+
+        Returns:
+            tuple: (action, reason) with action "tab" or "browser", or None
+        """
+        reason = None
+        if self.max_memory_mb and pid and self.since_recycle and self.since_recycle % self.sample_every == 0:
+            memory = process_tree_memory(pid)
+            if memory is not None:
+                self.memory_mb = memory / 2 ** 20
+                if self.memory_mb > self.max_memory_mb:
+                    reason = f"memory {self.memory_mb:.0f} MB over {self.max_memory_mb:g} MB"
+
+        drift = self.drift()
+        if reason is None and self.max_drift and drift is not None and drift > self.max_drift:
+            reason = f"send time {drift:.1f}x the start of the session"
+
+        if reason is None:
+            if self.recycle_every and self.since_recycle >= self.recycle_every:
+                return "tab", f"{self.since_recycle} contacts since the last recycle"
+            return None
+
+        # A fresh tab that did not bring memory or send times back within a window: restart the browser;
+        # if a fresh browser did not either, recycling does not help before the window is over
+        if self.since_recycle <= self.window:
+            if self.last_action == "tab":
+                return "browser", reason
+            if self.last_action == "browser":
+                return None
+        return "tab", reason
+
+    def recycled(self, action):
+        self.recycles[action] += 1
+        self.last_action = action
+        self.since_recycle = 0
+        self.recent.clear()
+
+
+def process_tree_memory(pid):
+    """
+    Resident memory in bytes of a process and all its descendants, or None
+    if it cannot be read on this system
+    """
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid follows the command name, which may contain spaces
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total = 0
+    found = False
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            found = True
+        except (OSError, ValueError):
+            pass
+        pending.extend(children.get(current, []))
+    return total if found else None
@@ -0,0 +1,85 @@
+"""
+Result Log
+
+Machine-readable stream of contact outcomes: one JSON line per contact with
+the number, name, template, attempts, outcome, error class and the duration
+of each send phase. Records are handed to a background thread, so JSON
+encoding and file I/O stay out of the send loop.
+
+Usage:
+    from result_log import ResultLog
+
+    results = ResultLog()
+    results.open("wasapy_results.jsonl", campaign="october")
+    results.record(row=1, numero="+51987654321", outcome="sent", durations={"compose": 0.2})
+    results.close()
+
+    # e.g. failed contacts of a campaign
+    jq -c 'select(.outcome == "failed")' wasapy_results.jsonl
+"""
+
+import os
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+
+DEFAULT_RESULTS_PATH = "wasapy_results.jsonl"
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False)
+
+
+class ResultLog:
+    """
+    Append-only JSONL result stream written by a background thread
+
+    Records are dropped silently until open() is called, so the send path
+    can always call record().
+    """
+
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self.fields = {}
+        atexit.register(self.close)
+
+    def open(self, path=DEFAULT_RESULTS_PATH, **fields):
+        """
+        Parameters:
+            path (str): JSONL file, appended to
+            **fields: Fields added to every record (e.g. campaign, worker)
+        """
+        self.close()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(JsonLineFormatter())
+        records = queue.SimpleQueue()
+        self.handler = QueueHandler(records)
+        self.listener = QueueListener(records, handler)
+        self.listener.start()
+        self.fields = fields
+        return self
+
+    def record(self, **fields):
+        if self.listener is None:
+            return
+        entry = {"ts": datetime.now().isoformat(timespec="seconds"), **self.fields, **fields}
+        self.handler.enqueue(logging.makeLogRecord({"msg": entry}))
+
+    def close(self):
+        if self.listener is None:
+            return
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.listener = None
+        self.handler = None
@@ -0,0 +1,113 @@
+"""
+Retry Queue
+
+Deferred retries for contacts whose send failed for a transient reason.
+Instead of retrying at once, while the UI is likely still in the state that
+made the send fail, the contact waits for a cool-down and is sent again
+between later contacts. Each error class has its own retry limit and
+backoff: a timeout is retried sooner and more often than a browser error.
+
+Usage:
+    from retry_queue import RetryQueue
+
+    retries = RetryQueue()
+    if not retries.defer(contact, "timeout"):   # False once the limit of the class is reached
+        ...                                     # final failure
+    contact = retries.pop_due()                 # a contact whose cool-down is over, or None
+    time.sleep(retries.wait_time())             # seconds until the next one is due
+    retries.finish(contact)                     # outcome is final: retries the contact took
+"""
+
+import time
+import heapq
+import itertools
+
+
+# Error class -> (retries per contact, cool-down in seconds before the first retry, doubled for each further retry)
+RETRY_POLICY = {
+    "timeout": (2, 30),
+    "chat_not_opened": (2, 20),
+    "browser": (1, 60),
+    "unexpected": (1, 60),
+}
+
+
+class RetryQueue:
+    """
+    Contacts waiting for a retry, ordered by the time they are due
+
+    Parameters:
+        policy (dict): Error class -> (retry limit, base cool-down seconds); classes not listed are not retried
+    """
+
+    def __init__(self, policy=None):
+        self.policy = dict(RETRY_POLICY if policy is None else policy)
+        self.waiting = []
+        self.retries = {}
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def __contains__(self, contact):
+        return any(item[2] == contact for item in self.waiting)
+
+    def defer(self, contact, error_class):
+        """
+        Queue a failed contact for a later retry
+
+        Returns:
+            bool: False if the contact already had all the retries allowed for this error class
+        """
+        limit, cool_down = self.policy.get(error_class, (0, 0))
+        counts = self.retries.setdefault(contact, {})
+        done = counts.get(error_class, 0)
+        if done >= limit:
+            return False
+
+        counts[error_class] = done + 1
+        heapq.heappush(self.waiting, (time.monotonic() + cool_down * 2 ** done, next(self._order), contact))
+        return True
+
+    def pop_due(self):
+        """
+        The next contact whose cool-down is over, or None
+        """
+        if self.waiting and self.waiting[0][0] <= time.monotonic():
+            return heapq.heappop(self.waiting)[2]
+        return None
+
+    def wait_time(self):
+        """
+        Seconds until the next contact is due (None if nothing is waiting)
+        """
+        if not self.waiting:
+            return None
+        return max(0.0, self.waiting[0][0] - time.monotonic())
+
+    def count(self, contact):
+        """
+        Times the contact was deferred so far
+        """
+        return sum(self.retries.get(contact, {}).values())
+
+    def finish(self, contact):
+        """
+        Forget a contact whose outcome is final
+
+        Returns:
+            int: Retries it took
+        """
+        retries = self.count(contact)
+        self.retries.pop(contact, None)
+        return retries
+
+    def drain(self):
+        """
+        Remove and return the waiting contacts, e.g. when the run stops
+        """
+        contacts = [item[2] for item in sorted(self.waiting)]
+        self.waiting = []
+        for contact in contacts:
+            self.retries.pop(contact, None)
+        return contacts
@@ -0,0 +1,122 @@
+"""
+Selector Cache
+
+Keeps hit/miss statistics for the DOM selectors (and reset strategies) the bot
+tries in order, so the ones that currently work on WhatsApp Web are tried first.
+
+Statistics are persisted to a JSON file between runs. Older runs weigh less:
+counts are multiplied by a decay factor every time the cache is loaded.
+
+Usage:
+    from selector_cache import SelectorRegistry
+
+    registry = SelectorRegistry()
+    registry.load()
+    for selector in registry.ordered("message", MESSAGE_SELECTORS):
+        ...
+    registry.record("message", tried_selectors, hit=selector)
+    registry.save()
+"""
+
+import os
+import json
+
+
+DEFAULT_CACHE_PATH = "selector_cache.json"
+
+
+class SelectorRegistry:
+    """
+    Hit/miss statistics per selector, grouped by lookup (e.g. "contact", "message")
+
+    Parameters:
+        path (str): JSON file where statistics are persisted
+        decay (float): Factor applied to stored counts when they are loaded
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, decay=0.5):
+        self.path = path
+        self.decay = decay
+        self.stats = {}
+        self.run_stats = {}
+
+    def load(self):
+        self.stats = {}
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        for group, selectors in data.items():
+            self.stats[group] = {
+                selector: [counts["hits"] * self.decay, counts["misses"] * self.decay]
+                for selector, counts in selectors.items()
+            }
+
+    def save(self):
+        data = {
+            group: {
+                selector: {"hits": round(hits, 3), "misses": round(misses, 3)}
+                for selector, (hits, misses) in selectors.items()
+            }
+            for group, selectors in self.stats.items()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def ordered(self, group, selectors):
+        """
+        Return selectors sorted by their smoothed success rate
+
+        Selectors without statistics keep their default position relative to
+        others with the same score.
+        """
+        learned = self.stats.get(group, {})
+
+        def score(selector):
+            hits, misses = learned.get(selector, (0, 0))
+            return (hits + 1) / (hits + misses + 2)
+
+        return sorted(selectors, key=lambda selector: -score(selector))
+
+    def record(self, group, tried, hit=None):
+        """
+        Record the outcome of one lookup
+
+        Parameters:
+            tried (list): Selectors attempted, in order
+            hit (str): Selector that matched, or None if none did
+        """
+        for selector in tried:
+            outcome = 0 if selector == hit else 1
+            for stats in (self.stats, self.run_stats):
+                counts = stats.setdefault(group, {}).setdefault(selector, [0, 0])
+                counts[outcome] += 1
+
+    def merge(self, run_stats):
+        """
+        Add the statistics of a run made elsewhere (e.g. a pool worker)
+        """
+        for group, selectors in run_stats.items():
+            for selector, (hits, misses) in selectors.items():
+                for stats in (self.stats, self.run_stats):
+                    counts = stats.setdefault(group, {}).setdefault(selector, [0, 0])
+                    counts[0] += hits
+                    counts[1] += misses
+
+    def summary_lines(self):
+        """
+        Returns:
+            list: One line per selector used in this run
+        """
+        lines = []
+        for group, selectors in sorted(self.run_stats.items()):
+            for selector, (hits, misses) in selectors.items():
+                lines.append(f"[{group}] {selector}: {hits} hits, {misses} misses")
+        return lines
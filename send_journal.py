@@ -0,0 +1,132 @@
+"""
+Send Journal
+
+Append-only record of contact outcomes for a campaign, used to resume a
+campaign without re-sending messages that were already delivered.
+
+Each campaign has one JSON Lines file in the journal directory. Every contact
+outcome is appended as one line; writes are flushed to disk in batches.
+
+Usage:
+    from send_journal import SendJournal
+
+    journal = SendJournal("october_sponsors")
+    sent_numbers = journal.sent_numbers()
+    with journal:
+        for row_num, numero, nombre, row in journal.pending(contacts, sent_numbers):
+            ...
+            journal.record(row_num, numero, nombre, "sent")
+"""
+
+import os
+import json
+from datetime import datetime
+
+
+DEFAULT_JOURNAL_DIR = "journals"
+
+
+def campaign_id_from_csv(csv_file):
+    """
+    Default campaign id: the CSV file name without extension
+    """
+    return os.path.splitext(os.path.basename(csv_file))[0]
+
+
+class SendJournal:
+    """
+    Append-only JSONL journal for one campaign
+
+    Parameters:
+        campaign_id (str): Campaign identifier, used as the file name
+        directory (str): Directory where journals are stored
+        sync_every (int): Number of records written between fsync calls
+    """
+
+    def __init__(self, campaign_id, directory=DEFAULT_JOURNAL_DIR, sync_every=10):
+        self.campaign_id = campaign_id
+        self.path = os.path.join(directory, f"{campaign_id}.jsonl")
+        self.sync_every = sync_every
+        self.skipped = 0
+        self._file = None
+        self._unsynced = 0
+
+    def sent_numbers(self):
+        """
+        Read the journal and return the numbers already sent in this campaign
+
+        Returns:
+            set: Numbers with a "sent" outcome
+        """
+        sent = set()
+        if not os.path.exists(self.path):
+            return sent
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line may be truncated if the process died mid-write
+                    continue
+                if entry.get("outcome") == "sent":
+                    sent.add(entry["numero"])
+        return sent
+
+    def pending(self, contacts, sent_numbers):
+        """
+        Yield only the contacts whose number is not in sent_numbers
+
+        Contacts are tuples starting with (row_num, numero, ...). Skipped
+        contacts are counted in self.skipped.
+        """
+        for contact in contacts:
+            if contact[1] in sent_numbers:
+                self.skipped += 1
+                continue
+            yield contact
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._write({"event": "start"})
+        return self
+
+    def record(self, row_num, numero, nombre, outcome, **extra):
+        """
+        Append one contact outcome to the journal
+
+        Parameters:
+            outcome (str): "sent" or "failed"
+            **extra: Additional fields to store with the record
+        """
+        entry = {"row": row_num, "numero": numero, "nombre": nombre, "outcome": outcome}
+        entry.update(extra)
+        self._write(entry)
+
+    def sync(self):
+        if self._file is None or self._unsynced == 0:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self._file is None:
+            return
+        self.sync()
+        self._file.close()
+        self._file = None
+
+    def _write(self, entry):
+        entry = {"ts": datetime.now().isoformat(timespec="seconds"), **entry}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,274 @@
+"""
+Send Schedule
+
+Persistent store of scheduled jobs for unattended sending, in a SQLite
+file. A job is a campaign (or a single follow-up) with a priority, a time
+before which nothing is sent, an optional daily sending window and an
+optional number of messages per day; its sends are stored with their
+rendered message, so the scheduler needs neither the CSV file nor the
+template.
+
+The scheduler asks for the next due send: jobs are taken by priority
+(highest first, then oldest), skipping jobs outside their window or over
+their daily quota, and the first pending send of a job comes from a partial
+index on the pending rows, so it is one index lookup however many sends
+are queued. Failed sends are retried later by moving their not-before time
+(see RETRY_POLICY in retry_queue.py), so retries survive restarts and
+sending windows.
+
+Usage:
+    from send_schedule import SendSchedule
+
+    with SendSchedule("wasapy_schedule.db") as schedule:
+        job_id, total = schedule.add_job("october", "csv_message", contacts, priority=0,
+                                         window="09:00-18:00", daily_quota=300)
+        job, send, wait = schedule.next_due()
+        if job is None:
+            time.sleep(wait)                     # nothing due for `wait` seconds
+        elif not schedule.defer(send["id"], "timeout"):
+            schedule.record(send["id"], success=False)
+"""
+
+import json
+import time
+import sqlite3
+from datetime import datetime, timedelta
+
+from retry_queue import RETRY_POLICY
+
+
+DEFAULT_SCHEDULE_PATH = "wasapy_schedule.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    campaign TEXT NOT NULL,
+    template TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    send_window TEXT,
+    daily_quota INTEGER,
+    state TEXT NOT NULL DEFAULT 'queued',
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    day TEXT,
+    day_sent INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    finished TEXT
+);
+CREATE TABLE IF NOT EXISTS sends (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    row INTEGER,
+    numero TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    mensaje TEXT NOT NULL,
+    attachment TEXT,
+    not_before REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    retries TEXT,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS sends_pending ON sends (job_id, not_before, id) WHERE state = 'pending';
+"""
+
+
+class SendSchedule:
+    """
+    SQLite store of scheduled jobs and their sends
+
+    Parameters:
+        path (str): Database file, created on first use
+    """
+
+    def __init__(self, path=DEFAULT_SCHEDULE_PATH):
+        self.path = path
+        self.db = None
+
+    def open(self):
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        # WAL lets jobs be added while the scheduler is sending
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        return self
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_job(self, campaign, template, sends, priority=0, not_before=None, window=None, daily_quota=None):
+        """
+        Store a job and its sends in one transaction
+
+        Parameters:
+            sends (iterable): (row_num, numero, nombre, mensaje, attachment) per message
+            not_before (float): Epoch seconds before which nothing is sent (default: now)
+            window (str): Daily sending window "HH:MM-HH:MM" in local time (may cross midnight)
+            daily_quota (int): Most messages of this job sent per day
+
+        Returns:
+            tuple: (job id, number of sends)
+
+        Raises:
+            ValueError: If the window or quota is not valid
+        """
+        if window:
+            parse_window(window)
+        if daily_quota is not None and daily_quota <= 0:
+            raise ValueError(f"Daily quota must be positive, got {daily_quota}")
+        not_before = time.time() if not_before is None else not_before
+
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO jobs (campaign, template, priority, not_before, send_window, daily_quota, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (campaign, template, priority, not_before, window, daily_quota, _now()),
+            )
+            job_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO sends (job_id, row, numero, nombre, mensaje, attachment, not_before) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((job_id, row_num, numero, nombre, mensaje, attachment, not_before) for row_num, numero, nombre, mensaje, attachment in sends),
+            )
+            total = self.db.execute("SELECT COUNT(*) FROM sends WHERE job_id = ?", (job_id,)).fetchone()[0]
+            self.db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+            if total == 0:
+                self.db.execute("UPDATE jobs SET state = 'done', finished = ? WHERE id = ?", (_now(), job_id))
+        return job_id, total
+
+    def active(self, campaign):
+        """
+        True if the campaign has a job that is not finished
+        """
+        row = self.db.execute("SELECT 1 FROM jobs WHERE campaign = ? AND state != 'done' LIMIT 1", (campaign,)).fetchone()
+        return row is not None
+
+    def next_due(self, max_per_day=None, now=None):
+        """
+        The send to make now
+
+        Parameters:
+            max_per_day (int): Most messages sent per day over all jobs
+
+        Returns:
+            tuple: (job, send, 0) with both as dicts, or (None, None, seconds)
+            when nothing is due for that many seconds (None if nothing is pending)
+        """
+        now = time.time() if now is None else now
+        moment = datetime.fromtimestamp(now)
+        today = moment.date().isoformat()
+        until_tomorrow = (datetime.combine(moment.date() + timedelta(days=1), datetime.min.time()) - moment).total_seconds()
+
+        if max_per_day:
+            sent_today = self.db.execute("SELECT COALESCE(SUM(day_sent), 0) FROM jobs WHERE day = ?", (today,)).fetchone()[0]
+            if sent_today >= max_per_day:
+                return None, None, until_tomorrow
+
+        waits = []
+        jobs = self.db.execute("SELECT * FROM jobs WHERE state != 'done' ORDER BY priority DESC, id").fetchall()
+        for job in jobs:
+            if job["daily_quota"] and job["day"] == today and job["day_sent"] >= job["daily_quota"]:
+                waits.append(until_tomorrow)
+                continue
+            if job["send_window"]:
+                opens_in = window_wait(job["send_window"], moment)
+                if opens_in > 0:
+                    waits.append(opens_in)
+                    continue
+
+            send = self.db.execute(
+                "SELECT * FROM sends WHERE job_id = ? AND state = 'pending' ORDER BY not_before, id LIMIT 1",
+                (job["id"],),
+            ).fetchone()
+            if send is None:
+                continue
+            if send["not_before"] <= now:
+                return dict(job), dict(send), 0
+            waits.append(send["not_before"] - now)
+
+        return None, None, min(waits) if waits else None
+
+    def record(self, send_id, success):
+        """
+        Store the final outcome of a send
+
+        Returns:
+            dict: The job after this send (its state is 'done' once every send has an outcome)
+        """
+        today = datetime.now().date().isoformat()
+        with self.db:
+            job_id = self.db.execute("SELECT job_id FROM sends WHERE id = ?", (send_id,)).fetchone()[0]
+            self.db.execute("UPDATE sends SET state = ?, updated = ? WHERE id = ?", ("sent" if success else "failed", _now(), send_id))
+            self.db.execute(
+                "UPDATE jobs SET state = 'running', sent = sent + ?, failed = failed + ?, "
+                "day_sent = (CASE WHEN day = ? THEN day_sent ELSE 0 END) + ?, day = ? WHERE id = ?",
+                (int(success), int(not success), today, int(success), today, job_id),
+            )
+            self.db.execute("UPDATE jobs SET state = 'done', finished = ? WHERE id = ? AND sent + failed >= total", (_now(), job_id))
+            return dict(self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def defer(self, send_id, error_class, now=None):
+        """
+        Move a failed send to a later time for a retry, within the limits of RETRY_POLICY
+
+        Returns:
+            bool: False if the send already had all the retries allowed for this error class
+        """
+        limit, cool_down = RETRY_POLICY.get(error_class, (0, 0))
+        now = time.time() if now is None else now
+        with self.db:
+            row = self.db.execute("SELECT retries FROM sends WHERE id = ?", (send_id,)).fetchone()
+            counts = json.loads(row["retries"] or "{}")
+            done = counts.get(error_class, 0)
+            if done >= limit:
+                return False
+            counts[error_class] = done + 1
+            self.db.execute(
+                "UPDATE sends SET retries = ?, not_before = ?, updated = ? WHERE id = ?",
+                (json.dumps(counts), now + cool_down * 2 ** done, _now(), send_id),
+            )
+        return True
+
+    def jobs(self):
+        return [dict(job) for job in self.db.execute("SELECT * FROM jobs ORDER BY id")]
+
+
+def parse_window(window):
+    """
+    Parse a daily window "HH:MM-HH:MM" into start and end minutes of the day
+
+    Raises:
+        ValueError: If the window is not valid
+    """
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M") for part in window.split("-"))
+    except ValueError:
+        raise ValueError(f"Invalid sending window '{window}', expected HH:MM-HH:MM")
+    start, end = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+    if start == end:
+        raise ValueError(f"Sending window '{window}' is empty")
+    return start, end
+
+
+def window_wait(window, moment):
+    """
+    Seconds from moment until the window is open (0 while it is open)
+    """
+    start, end = parse_window(window)
+    minute = moment.hour * 60 + moment.minute + moment.second / 60
+    is_open = start <= minute < end if start < end else minute >= start or minute < end
+    if is_open:
+        return 0.0
+    return (start - minute) % (24 * 60) * 60
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
@@ -0,0 +1,112 @@
+"""
+Browser Supervisor
+
+Keeps one browser session of the bot running: starts it, and after Firefox
+or geckodriver crashes, starts it again with the same profile so the
+WhatsApp Web login is kept and the campaign continues from the current row.
+The browser itself is created by callbacks, so this module does not depend
+on Selenium.
+
+Usage:
+    from supervisor import BrowserSupervisor, BrowserStartError
+
+    supervisor = BrowserSupervisor(start_browser, stop_browser, driver_alive, max_restarts=3)
+    driver = supervisor.start()
+    ...
+    if not supervisor.alive():
+        driver = supervisor.restart()     # raises BrowserStartError when it gives up
+    driver = supervisor.recycle()         # planned fresh browser, not counted as a restart
+    supervisor.stop()
+"""
+
+import time
+
+
+class BrowserStartError(Exception):
+    """
+    The browser could not be started or is not logged in
+
+    Parameters:
+        message (str): What went wrong
+        qr_needed (bool): WhatsApp Web asks for a QR scan, restarting again will not help
+    """
+
+    def __init__(self, message, qr_needed=False):
+        super().__init__(message)
+        self.qr_needed = qr_needed
+
+
+class BrowserSupervisor:
+    """
+    Starts, checks and restarts one browser session
+
+    Parameters:
+        start (callable): Returns a new logged-in driver, raises BrowserStartError otherwise
+        stop (callable): Closes a driver (errors are ignored)
+        alive (callable): alive(driver) is True while the driver responds
+        max_restarts (int): Restarts allowed per run before giving up
+        backoff (float): Seconds to wait before a restart, doubled after each one
+        logger: Logger for restarts (optional)
+    """
+
+    def __init__(self, start, stop, alive, max_restarts=3, backoff=5.0, logger=None):
+        self._start = start
+        self._stop = stop
+        self._alive = alive
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.logger = logger
+        self.driver = None
+        self.restarts = 0
+
+    def start(self):
+        self.driver = self._start()
+        return self.driver
+
+    def alive(self):
+        return self.driver is not None and self._alive(self.driver)
+
+    def restart(self):
+        """
+        Close the dead browser and start a new one with the same profile
+
+        Returns:
+            The new driver
+
+        Raises:
+            BrowserStartError: After max_restarts restarts, or if the new browser is not logged in
+        """
+        if self.restarts >= self.max_restarts:
+            raise BrowserStartError(f"Browser crashed again after {self.restarts} restarts, giving up")
+
+        self.stop()
+        delay = self.backoff * 2 ** self.restarts
+        self.restarts += 1
+        if self.logger is not None:
+            self.logger.warning("BROWSER RESTART %s/%s in %.0f seconds...", self.restarts, self.max_restarts, delay)
+        time.sleep(delay)
+        return self.start()
+
+    def recycle(self):
+        """
+        Close the running browser and start a fresh one with the same
+        profile, e.g. to release memory. Planned recycles do not count
+        towards max_restarts and do not wait.
+
+        Returns:
+            The new driver
+
+        Raises:
+            BrowserStartError: If the new browser does not start or is not logged in
+        """
+        self.stop()
+        return self.start()
+
+    def stop(self):
+        if self.driver is None:
+            return
+        try:
+            self._stop(self.driver)
+        except Exception:
+            pass
+        self.driver = None
@@ -1,88 +1,390 @@
+import os
 import csv
 import sys
 import time
+import queue
+import collections
+import atexit
+import signal
 import argparse
 import logging
+import threading
+import multiprocessing
+from urllib.parse import quote
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
-from message_templates import get_message_template
+from message_templates import get_message_template, CompiledTemplate
+from send_journal import SendJournal, campaign_id_from_csv
+from selector_cache import SelectorRegistry
+from metrics import SendMetrics
+from phone_numbers import InvalidNumberCache, NumberFilter, DEFAULT_COUNTRY_CODE
+from delivery_tracker import DeliveryTracker
+from pacing import PacingController, DEFAULT_MIN_RATE, DEFAULT_MAX_RATE
+from daemon import JobStore, start_server, DEFAULT_PORT
+from supervisor import BrowserSupervisor, BrowserStartError
+from result_log import ResultLog, DEFAULT_RESULTS_PATH
+from media import MediaCache
+from replies import ReplyCollector, ReplyWriter, DEFAULT_REPLIES_PATH, DEFAULT_STATE_PATH
+from browsers import get_browser, browser_for, BROWSERS
+from retry_queue import RetryQueue
+from send_schedule import SendSchedule, DEFAULT_SCHEDULE_PATH, parse_window
+from resource_watchdog import ResourceWatchdog, DEFAULT_MAX_MEMORY_MB, DEFAULT_MAX_DRIFT
+from history import RunHistory, estimate_remaining, format_duration, DEFAULT_HISTORY_PATH, DEFAULT_CONTACT_SECONDS
+
+
+log_listener = None
+log_listener_pid = None
+log_level = logging.INFO
 
 
 def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        handlers=[
+    """
+    Log to wasapy.log and stdout through a queue: the send loop only enqueues
+    records and a background thread writes them.
+
+    A forked worker process gets its own listener, since the parent's thread
+    does not exist in the child.
+    """
+    global log_listener, log_listener_pid
+    
+    if log_listener is None or log_listener_pid != os.getpid():
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        handlers = [
             logging.FileHandler('wasapy.log', encoding='utf-8'),
             logging.StreamHandler(sys.stdout)
         ]
-    )
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(log_level)
+        
+        log_listener = QueueListener(log_queue, *handlers)
+        log_listener.start()
+        log_listener_pid = os.getpid()
+        atexit.register(stop_logging)
+    
     return logging.getLogger(__name__)
 
 
+def stop_logging():
+    """
+    Write out the queued log records; worker processes call this before exiting
+    """
+    global log_listener
+    if log_listener is not None and log_listener_pid == os.getpid():
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+
+WHATSAPP_URL = "https://web.whatsapp.com/"
+
+selector_registry = SelectorRegistry()
+send_metrics = SendMetrics()
+invalid_numbers = InvalidNumberCache()
+delivery_tracker = DeliveryTracker()
+pacer = PacingController()
+result_log = ResultLog()
+media_cache = MediaCache()
+watchdog = ResourceWatchdog()
+retry_queue = RetryQueue()
+
+POLL_INTERVAL = 0.1
+
+# Exit code when the profile is not logged in and WhatsApp Web shows the QR code
+EXIT_QR_NEEDED = 3
+
+# Longest idle wait of the scheduler, so jobs added meanwhile are picked up
+SCHEDULER_POLL = 60
+
+STEP_TIMEOUTS = {
+    "chat_list": 10,
+    "app_load": 30,
+    "search_results": 5,
+    "conversation": 10,
+    "composer": 3,
+    "login": 120,
+    "attach": 5,
+    "media_preview": 20,
+    "forward_dialog": 10,
+}
+
+# The new-chat icon stays in the DOM while a chat, drawer or dialog is open,
+# so the list only counts as ready with its pane shown and nothing over it
+CHAT_LIST_READY_SCRIPT = """
+if (document.querySelector("div[data-animate-modal-popup='true'], div[role='dialog']")) { return false; }
+if (document.querySelector("div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']")) { return false; }
+for (const icon of document.querySelectorAll("span[data-icon='back'], span[data-icon='arrow-back']")) {
+    if (!icon.closest('#main')) { return false; }
+}
+return document.querySelector('#pane-side') !== null && document.querySelector("[data-icon='new-chat-outline']") !== null;
+"""
+
+SEARCH_RESULTS_SCRIPT = """
+const numero = arguments[0];
+const digits = numero.replace(/\D/g, '');
+for (const span of document.querySelectorAll("span[dir='auto']")) {
+    if ((span.textContent || '').includes('No se encontraron resultados para')) { return 'empty'; }
+}
+for (const item of document.querySelectorAll("div[role='listitem'], div[data-testid='cell-frame-container']")) {
+    if (item.outerHTML.includes(numero) || (item.textContent || '').replace(/\D/g, '').includes(digits)) { return 'found'; }
+}
+return null;
+"""
+
+# Returns the "no results" text for an invalid number, or 'open' once the chat is open
+ENTER_RESULT_SCRIPT = """
+for (const span of document.querySelectorAll("span[dir='auto']")) {
+    if ((span.textContent || '').includes('No se encontraron resultados para')) { return span.textContent; }
+}
+if (document.querySelector("div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']")) { return null; }
+return document.querySelector("div[data-testid='conversation-panel-body'], #main footer div[contenteditable='true']") ? 'open' : null;
+"""
+
+CONVERSATION_READY_SCRIPT = """
+if (document.querySelector("div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']")) { return false; }
+return document.querySelector("div[data-testid='conversation-panel-body'], #main footer div[contenteditable='true']") !== null;
+"""
+
+COMPOSER_FOCUSED_SCRIPT = """
+const active = document.activeElement;
+if (!active || !active.isContentEditable) { return false; }
+const label = ((active.getAttribute('aria-placeholder') || '') + (active.getAttribute('aria-label') || '')).toLowerCase();
+return !label.includes('buscar') && !label.includes('search');
+"""
+
+OUTGOING_COUNT_SCRIPT = """
+return document.querySelectorAll("div.message-out").length;
+"""
+
+# Returns 'ready' once the chat list is shown, 'qr' while the login QR code is shown
+LOGIN_STATE_SCRIPT = """
+if (document.querySelector("[data-icon='new-chat-outline']")) { return 'ready'; }
+if (document.querySelector("div[data-ref] canvas, canvas[aria-label*='Scan'], canvas[aria-label*='scan'], canvas[aria-label*='Escanea']")) { return 'qr'; }
+return null;
+"""
+
+OUTGOING_STATUS_SCRIPT = """
+const bubbles = document.querySelectorAll("div.message-out");
+if (bubbles.length <= arguments[0]) { return null; }
+const icon = bubbles[bubbles.length - 1].querySelector("span[data-icon^='msg-']");
+return icon ? icon.getAttribute('data-icon') : '';
+"""
+
+
+def wait_for(driver, script, step, logger, *args):
+    """
+    Poll an in-page readiness script until it returns a truthy value.
+
+    Parameters:
+        script (str): JavaScript predicate, called with *args
+        step (str): Key of STEP_TIMEOUTS giving the timeout for this step
+
+    Returns:
+        The script result, or None if the step timed out
+    """
+    timeout = STEP_TIMEOUTS[step]
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            lambda d: d.execute_script(script, *args)
+        )
+    except TimeoutException:
+        logger.debug("Timeout after %ss waiting for %s", timeout, step)
+        return None
+
+
+def wait_for_login(driver, logger, headless=False, timeout=None):
+    """
+    Poll until WhatsApp Web shows the chat list.
+
+    In a visible browser the QR code can still be scanned while waiting; in
+    headless mode nobody can scan it, so a QR code ends the wait at once.
+
+    Parameters:
+        timeout (float): Seconds to wait (default: STEP_TIMEOUTS["login"]; 0 waits without limit)
+
+    Returns:
+        str: 'ready' when logged in, 'qr' if the QR code is shown, None if the page never loaded
+    """
+    timeout = STEP_TIMEOUTS["login"] if timeout is None else timeout
+    deadline = time.time() + timeout if timeout else None
+    state = None
+    qr_reported = False
+    while deadline is None or time.time() < deadline:
+        state = driver.execute_script(LOGIN_STATE_SCRIPT)
+        if state == "ready" or (state == "qr" and headless):
+            return state
+        if state == "qr" and not qr_reported:
+            logger.info("Scan the QR code in WhatsApp Web (%s)...", f'waiting up to {timeout} seconds' if timeout else 'waiting without time limit')
+            qr_reported = True
+        time.sleep(POLL_INTERVAL * 5)
+    return state
+
+
+# Health probe: classifies the UI in one call so recovery can start with the cheapest fix
+UI_STATE_SCRIPT = """
+if (!location.href.startsWith(arguments[0])) { return 'offsite'; }
+if (document.querySelector("div[data-ref] canvas, canvas[aria-label*='Scan'], canvas[aria-label*='scan'], canvas[aria-label*='Escanea']")) { return 'qr'; }
+if (document.querySelector("div[data-animate-modal-popup='true'], div[role='dialog']")) { return 'modal'; }
+if (document.querySelector("div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']")) { return 'drawer'; }
+for (const icon of document.querySelectorAll("span[data-icon='back'], span[data-icon='arrow-back']")) {
+    if (!icon.closest('#main')) { return 'drawer'; }
+}
+if (document.querySelector('#pane-side') && document.querySelector("[data-icon='new-chat-outline']")) { return 'ready'; }
+return 'loading';
+"""
+
+
+def probe_ui_state(driver):
+    """
+    Returns:
+        str: 'ready', 'drawer', 'modal', 'loading', 'qr', 'offsite', or 'dead' if the browser does not respond
+    """
+    try:
+        return driver.execute_script(UI_STATE_SCRIPT, WHATSAPP_URL) or "loading"
+    except WebDriverException:
+        return "dead"
+
+
+def reset_via_logo(driver, logger):
+    try:
+        whatsapp_logo = driver.find_element(By.CSS_SELECTOR, "div[data-testid='logo']")
+        if whatsapp_logo.is_displayed():
+            whatsapp_logo.click()
+            return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "chat_list", logger))
+    except:
+        logger.debug("Could not click WhatsApp logo")
+    return False
+
+
+def reset_via_chat_list(driver, logger):
+    try:
+        chat_list = driver.find_element(By.CSS_SELECTOR, "div[data-testid='chat-list']")
+        if chat_list.is_displayed():
+            driver.execute_script("arguments[0].click();", chat_list)
+            return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "chat_list", logger))
+    except:
+        logger.debug("Could not click chat list")
+    return False
+
+
+def reset_via_escape(driver, logger):
+    try:
+        browser = browser_for(driver)
+        browser.press_escape(driver)
+        browser.press_escape(driver)
+        return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "chat_list", logger))
+    except:
+        logger.debug("Could not use ESC key")
+    return False
+
+
+def reset_via_modal(driver, logger):
+    try:
+        button = driver.find_element(By.CSS_SELECTOR, "div[data-animate-modal-popup='true'] button, div[role='dialog'] button")
+        button.click()
+        return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "chat_list", logger))
+    except:
+        logger.debug("Could not dismiss dialog")
+    return False
+
+
+def reset_via_wait(driver, logger):
+    # The app is still loading or reconnecting: waiting is cheaper than a reload
+    return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "app_load", logger))
+
+
+def reset_via_navigation(driver, logger):
+    try:
+        driver.get(WHATSAPP_URL)
+        return bool(wait_for(driver, CHAT_LIST_READY_SCRIPT, "app_load", logger))
+    except:
+        logger.debug("Could not navigate to base URL")
+    return False
+
+
+RESET_STRATEGIES = {
+    "logo": reset_via_logo,
+    "chat_list": reset_via_chat_list,
+    "escape": reset_via_escape,
+}
+
+RECOVERY_STRATEGIES = {
+    **RESET_STRATEGIES,
+    "modal": reset_via_modal,
+    "wait": reset_via_wait,
+    "navigation": reset_via_navigation,
+}
+
+# First strategies to try for each UI state reported by the health probe.
+# The learned strategies and a full reload follow if these do not work.
+RECOVERY_TIERS = {
+    "drawer": ["escape", "logo"],
+    "modal": ["modal", "escape"],
+    "loading": ["wait"],
+    "offsite": ["navigation"],
+}
+
+
 def reset_to_chat_list(driver, wait, logger):
+    clock = send_metrics.clock()
     try:
-        logger.debug("Resetting to chat list...")
-        
-        try:
-            whatsapp_logo = driver.find_element(By.CSS_SELECTOR, "div[data-testid='logo']")
-            if whatsapp_logo.is_displayed():
-                whatsapp_logo.click()
-                time.sleep(1)
-                logger.debug("Reset successful via WhatsApp logo")
-                return True
-        except:
-            logger.debug("Could not click WhatsApp logo")
-        
-        try:
-            chat_list = driver.find_element(By.CSS_SELECTOR, "div[data-testid='chat-list']")
-            if chat_list.is_displayed():
-                driver.execute_script("arguments[0].click();", chat_list)
-                time.sleep(1)
-                logger.debug("Reset successful via chat list")
-                return True
-        except:
-            logger.debug("Could not click chat list")
+        state = probe_ui_state(driver)
+        send_metrics.increment(f"ui_state_{state}")
+        logger.debug("Resetting to chat list from UI state '%s'...", state)
         
-        try:
-            driver.switch_to.active_element.send_keys(Keys.ESCAPE)
-            time.sleep(0.5)
-            driver.switch_to.active_element.send_keys(Keys.ESCAPE)
-            time.sleep(1)
-            logger.debug("Reset successful via ESC key")
+        if state == "ready":
             return True
-        except:
-            logger.debug("Could not use ESC key")
+        if state in ("dead", "qr"):
+            logger.warning("Cannot reset to chat list: %s", 'browser is not responding' if state == 'dead' else 'WhatsApp Web asks for a QR scan')
+            send_metrics.increment("reset_failed")
+            return False
         
-        try:
-            current_url = driver.current_url
-            if "https://web.whatsapp.com" in current_url and len(current_url) > 25:
-                driver.get("https://web.whatsapp.com/")
-                time.sleep(3)
-                logger.debug("Reset successful via direct navigation")
+        # Tiers for the probed state first, then the cheap strategies in the
+        # order learned from past runs; a full reload is always the last resort
+        names = list(RECOVERY_TIERS.get(state, []))
+        names += [name for name in selector_registry.ordered("reset", list(RESET_STRATEGIES)) if name not in names]
+        if "navigation" not in names:
+            names.append("navigation")
+        
+        tried = []
+        for name in names:
+            tried.append(name)
+            if RECOVERY_STRATEGIES[name](driver, logger):
+                selector_registry.record("reset", tried, hit=name)
+                send_metrics.increment(f"reset_via_{name}")
+                logger.debug("Reset successful via %s", name)
                 return True
-        except:
-            logger.debug("Could not navigate to base URL")
-            
+        
+        selector_registry.record("reset", tried)
+        send_metrics.increment("reset_failed")
         return False
         
     except Exception as e:
-        logger.debug(f"Error in reset_to_chat_list: {e}")
+        logger.debug("Error in reset_to_chat_list: %s", e)
+        send_metrics.increment("reset_failed")
         return False
+    
+    finally:
+        clock.mark("reset_to_chat_list")
 
 
 def ensure_new_chat_button_available(driver, wait, logger, max_attempts=3):
     for attempt in range(1, max_attempts + 1):
         try:
-            logger.debug(f"Attempt {attempt}/{max_attempts} - Looking for new chat button...")
+            logger.debug("Attempt %s/%s - Looking for new chat button...", attempt, max_attempts)
             
             new_chat = wait.until(
                 EC.element_to_be_clickable((By.CSS_SELECTOR, '[data-icon="new-chat-outline"]'))
@@ -95,352 +397,2099 @@ def ensure_new_chat_button_available(driver, wait, logger, max_attempts=3):
                 logger.debug("Button found but not visible")
                 
         except TimeoutException:
-            logger.debug(f"Timeout on attempt {attempt}")
+            logger.debug("Timeout on attempt %s", attempt)
             
             if attempt < max_attempts:
                 reset_to_chat_list(driver, wait, logger)
-                time.sleep(2)
             
         except Exception as e:
-            logger.debug(f"Error on attempt {attempt}: {e}")
+            logger.debug("Error on attempt %s: %s", attempt, e)
             
             if attempt < max_attempts:
                 reset_to_chat_list(driver, wait, logger)
-                time.sleep(2)
     
     return None
 
 
-def send_message_with_retry(driver, wait, numero, nombre, template_name="default", max_attempts=2):
+COMPOSE_MODES = ("paste", "insert", "type")
+
+PASTE_TEXT_SCRIPT = """
+const box = arguments[0];
+box.focus();
+const data = new DataTransfer();
+data.setData('text/plain', arguments[1]);
+box.dispatchEvent(new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true}));
+"""
+
+INSERT_TEXT_SCRIPT = """
+const box = arguments[0];
+box.focus();
+return document.execCommand('insertText', false, arguments[1]);
+"""
+
+
+def type_message(element, mensaje):
+    for char in mensaje:
+        if char == '\n':
+            element.send_keys(Keys.SHIFT, Keys.ENTER)
+        else:
+            element.send_keys(char)
+        time.sleep(0.05)
+
+
+def paste_message(driver, element, mensaje):
+    driver.execute_script(PASTE_TEXT_SCRIPT, element, mensaje)
+
+
+def insert_message(driver, element, mensaje):
+    # Chromium inserts the text natively through DevTools, other browsers by script
+    if browser_for(driver).insert_text(driver, element, mensaje):
+        return
+    for index, line in enumerate(mensaje.split('\n')):
+        if index > 0:
+            element.send_keys(Keys.SHIFT, Keys.ENTER)
+        if line:
+            driver.execute_script(INSERT_TEXT_SCRIPT, element, line)
+
+
+def message_box_matches(element, mensaje):
+    content = element.get_attribute('textContent') or ""
+    return "".join(content.split()) == "".join(mensaje.split())
+
+
+def clear_message_box(element):
+    try:
+        element.send_keys(Keys.CONTROL + "a")
+        element.send_keys(Keys.DELETE)
+    except:
+        pass
+
+
+def compose_message(driver, element, mensaje, compose_mode, logger, prefilled=False):
+    """
+    Put the whole message into the message box using the selected engine.
+
+    "paste" and "insert" write the message in one or a few script calls; if the
+    box does not end up holding the message, it is cleared and typed char by char.
+    When the box was pre-filled through a chat link, it is only rewritten if its
+    content does not match the message.
+
+    Returns:
+        str: Compose mode that actually wrote the message
+    """
+    if prefilled:
+        if message_box_matches(element, mensaje):
+            logger.debug("Message already pre-filled via link")
+            return "prefill"
+        clear_message_box(element)
+    
+    if compose_mode != "type":
+        try:
+            if compose_mode == "paste":
+                paste_message(driver, element, mensaje)
+            else:
+                insert_message(driver, element, mensaje)
+            
+            if message_box_matches(element, mensaje):
+                logger.debug("Message written with compose mode: %s", compose_mode)
+                return compose_mode
+            
+            logger.debug("Compose mode '%s' did not fill the message box, falling back to typing", compose_mode)
+        except Exception as e:
+            logger.debug("Compose mode '%s' failed, falling back to typing: %s", compose_mode, e)
+        
+        clear_message_box(element)
+    
+    type_message(element, mensaje)
+    return "type"
+
+
+CONTACT_SELECTORS = [
+    "span[title*='{numero}']",
+    "div[data-testid='cell-frame-container']",
+    "div[role='listitem']",
+    "div[data-testid='chat']"
+]
+
+MESSAGE_SELECTORS = [
+    "div[contenteditable='true'][role='textbox'][data-lexical-editor='true']",
+    "div[contenteditable='true'][data-tab='10']",
+    "div[contenteditable='true'][aria-placeholder='Escribe un mensaje']",
+    "div[contenteditable='true'][aria-label*='Escribe a']"
+]
+
+FIND_CONTACT_SCRIPT = """
+const selectors = arguments[0];
+const numero = arguments[1];
+// Numbers are shown formatted ("+51 987 654 321"), so also compare digits only
+const digits = numero.replace(/\D/g, '');
+const matches = (contact) => {
+    const text = (contact.textContent || '') + ' ' + (contact.getAttribute('title') || '');
+    return contact.outerHTML.includes(numero) || text.replace(/\D/g, '').includes(digits);
+};
+for (let index = 0; index < selectors.length; index++) {
+    let contacts;
+    try { contacts = document.querySelectorAll(selectors[index]); } catch (e) { continue; }
+    for (const contact of contacts) {
+        if (matches(contact)) {
+            contact.click();
+            return index;
+        }
+    }
+}
+return null;
+"""
+
+FIND_MESSAGE_BOX_SCRIPT = """
+const selectors = arguments[0];
+for (let index = 0; index < selectors.length; index++) {
+    let elements;
+    try { elements = document.querySelectorAll(selectors[index]); } catch (e) { continue; }
+    for (const element of elements) {
+        const label = ((element.getAttribute('aria-placeholder') || '') + ' ' + (element.getAttribute('aria-label') || '')).toLowerCase();
+        const isSearchBar = label.includes('buscar') || label.includes('search');
+        if (!isSearchBar && element.getClientRects().length > 0) {
+            return [element, index];
+        }
+    }
+}
+return null;
+"""
+
+
+# Returns the file input for photos (arguments[0] true) or documents, opening the attach menu first
+ATTACH_INPUT_SCRIPT = """
+const wantImage = arguments[0];
+for (const input of document.querySelectorAll("input[type='file']")) {
+    if ((input.getAttribute('accept') || '').includes('image') === wantImage) { return input; }
+}
+// Opening the menu again too soon would close it
+if (Date.now() - (window.wasapyAttachMenuAt || 0) < 1000) { return null; }
+const button = document.querySelector("footer span[data-icon='plus'], footer span[data-icon='plus-rounded'], footer span[data-icon='attach-menu-plus'], footer span[data-icon='clip'], footer button[title='Adjuntar']");
+if (button) {
+    (button.closest("button, [role='button']") || button).click();
+    window.wasapyAttachMenuAt = Date.now();
+}
+return null;
+"""
+
+MEDIA_CAPTION_SCRIPT = """
+for (const box of document.querySelectorAll("div[contenteditable='true']")) {
+    const label = ((box.getAttribute('aria-placeholder') || '') + ' ' + (box.getAttribute('aria-label') || '')).toLowerCase();
+    if ((label.includes('comentario') || label.includes('caption') || label.includes('mensaje')) && !box.closest('footer') && box.getClientRects().length > 0) {
+        return box;
+    }
+}
+return null;
+"""
+
+
+def send_attachment(driver, attachment, caption, compose_mode, logger):
+    """
+    Attach a file in the open chat and send it with the message as caption.
+
+    Images go through the photo input so they are shown inline; other files
+    are sent as documents.
+
+    Raises:
+        TimeoutException: If the attach menu or the preview does not open
+    """
+    file_input = wait_for(driver, ATTACH_INPUT_SCRIPT, "attach", logger, media_cache.is_image(attachment))
+    if file_input is None:
+        raise TimeoutException("Attach menu did not open")
+    logger.debug("Attaching %s", attachment)
+    file_input.send_keys(attachment)
+    
+    caption_box = wait_for(driver, MEDIA_CAPTION_SCRIPT, "media_preview", logger)
+    if caption_box is None:
+        raise TimeoutException("Attachment preview did not open")
+    if caption:
+        compose_message(driver, caption_box, caption, compose_mode, logger)
+    caption_box.send_keys(Keys.ENTER)
+
+
+def find_and_click_contact(driver, numero, logger):
+    """
+    Find the search result for the number and click it, in a single script call.
+
+    Returns:
+        str: Selector that matched, or None if the contact was not found
+    """
+    ordered = selector_registry.ordered("contact", CONTACT_SELECTORS)
+    selectors = [selector.format(numero=numero) for selector in ordered]
+    start = time.perf_counter()
+    index = driver.execute_script(FIND_CONTACT_SCRIPT, selectors, numero)
+    logger.debug("Contact lookup took %.0f ms", (time.perf_counter() - start) * 1000)
+    
+    if index is None:
+        selector_registry.record("contact", ordered)
+        return None
+    
+    selector_registry.record("contact", ordered[:index + 1], hit=ordered[index])
+    logger.debug("Contact found and clicked with selector: %s", selectors[index])
+    return selectors[index]
+
+
+def find_message_box(driver, logger):
+    """
+    Find the visible message box that is not a search bar, in a single script call.
+
+    Returns:
+        WebElement: Message box, or None if no selector matched
+    """
+    ordered = selector_registry.ordered("message", MESSAGE_SELECTORS)
+    start = time.perf_counter()
+    found = driver.execute_script(FIND_MESSAGE_BOX_SCRIPT, ordered)
+    logger.debug("Message field lookup took %.0f ms", (time.perf_counter() - start) * 1000)
+    
+    if found is None:
+        selector_registry.record("message", ordered)
+        return None
+    
+    sms_box, index = found
+    selector_registry.record("message", ordered[:index + 1], hit=ordered[index])
+    logger.debug("Message field found with selector: %s", ordered[index])
+    return sms_box
+
+
+def open_chat_via_search(driver, wait, numero, logger):
+    """
+    Open the chat through the new chat button and the number search box.
+
+    Returns:
+        bool: True when the chat was opened, False for an invalid number,
+        None when the new chat button is not available
+    """
+    clock = send_metrics.clock()
+    logger.debug("Looking for new chat button...")
+    new_chat = ensure_new_chat_button_available(driver, wait, logger)
+    clock.mark("search_new_chat_button")
+    
+    if new_chat is None:
+        logger.warning("Could not find new chat button")
+        return None
+        
+    try:
+        new_chat.click()
+    except:
+        driver.execute_script("arguments[0].click();", new_chat)
+    
+    logger.debug("New chat button clicked")
+
+    logger.debug("Looking for search box...")
+    search_box = wait.until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']"))
+    )
+    clock.mark("search_box")
+    
+    search_box.click()
+    search_box.clear()
+    
+    try:
+        search_box.send_keys(Keys.CONTROL + "a")
+        search_box.send_keys(Keys.DELETE)
+    except:
+        pass
+    
+    logger.debug("Writing number: %s", numero)
+    search_box.send_keys(numero)
+
+    wait_for(driver, SEARCH_RESULTS_SCRIPT, "search_results", logger, numero)
+    clock.mark("search_number")
+    
+    logger.debug("Looking for contact in results...")
+    contact_found = find_and_click_contact(driver, numero, logger) is not None
+    clock.mark("search_select_contact")
+    
+    if not contact_found:
+        logger.debug("Contact not found in list, trying ENTER...")
+        search_box.send_keys(Keys.ENTER)
+        result = wait_for(driver, ENTER_RESULT_SCRIPT, "search_results", logger)
+        clock.mark("search_enter_fallback")
+        
+        if result and result != "open":
+            logger.warning("INVALID NUMBER - %s", result)
+            return False
+    
+    return True
+
+
+OPEN_MODES = ("search", "link")
+
+LINK_STATE_SCRIPT = """
+const popup = document.querySelector("div[data-animate-modal-popup='true'], div[role='dialog']");
+if (popup) {
+    const text = (popup.textContent || '').toLowerCase();
+    if (text.includes('no es válido') || text.includes('invalid') || text.includes('not valid')) {
+        const button = popup.querySelector('button');
+        if (button) { button.click(); }
+        return 'invalid';
+    }
+}
+if (document.querySelector("footer div[contenteditable='true'], div[data-testid='conversation-panel-body']")) {
+    return 'open';
+}
+return null;
+"""
+
+
+def open_chat_via_link(driver, numero, logger, text=None, timeout=20):
+    """
+    Open the chat by navigating straight to the WhatsApp Web send link.
+
+    Parameters:
+        text (str): Optional message to pre-fill in the message box
+
+    Returns:
+        bool: True when the chat was opened, False when WhatsApp reports the
+        number as invalid, None when the chat could not be opened in time
+    """
+    phone = "".join(char for char in numero if char.isdigit())
+    url = f"{WHATSAPP_URL}send?phone={phone}"
+    if text:
+        url += f"&text={quote(text)}"
+    
+    logger.debug("Opening chat via link for: %s", phone)
+    try:
+        driver.get(url)
+        state = WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.execute_script(LINK_STATE_SCRIPT)
+        )
+    except TimeoutException:
+        logger.debug("Timeout waiting for chat to open via link")
+        return None
+    except WebDriverException as e:
+        logger.debug("Error opening chat via link: %s", e)
+        return None
+    
+    if state == "invalid":
+        return False
+    
+    logger.debug("Chat opened via link")
+    return True
+
+
+def send_message_with_retry(driver, wait, numero, nombre, template_name="default", max_attempts=2, compose_mode="paste", open_mode="search", prefill=False, mensaje=None, row_num=None, attachment=None, defer=None):
+    """
+    Send one message, retrying up to max_attempts times right away.
+
+    Parameters:
+        defer (callable): defer(error_class) is called when the last attempt
+            failed; if it returns True the contact will be retried later and
+            its result record has the outcome 'deferred'
+
+    Returns:
+        bool: True if the message was sent
+    """
     logger = logging.getLogger(__name__)
     
-    mensaje = get_message_template(template_name, nombre=nombre)
+    if mensaje is None:
+        mensaje = get_message_template(template_name, nombre=nombre)
+    
+    durations = {}
+    error = None
+    error_class = None
+    
+    def finish(outcome, attempts):
+        result_log.record(
+            row=row_num,
+            numero=numero,
+            nombre=nombre,
+            template=template_name,
+            attempts=attempts,
+            outcome=outcome,
+            error=error,
+            attachment=attachment,
+            durations={phase: round(seconds, 3) for phase, seconds in durations.items()},
+        )
+        return outcome == "sent"
     
     for attempt in range(1, max_attempts + 1):
+        send_metrics.increment("attempts")
+        clock = send_metrics.clock(durations)
         try:
-            logger.info(f"Attempt {attempt}/{max_attempts} - Sending personalized message to {nombre} ({numero})")
+            logger.info("Attempt %s/%s - Sending personalized message to %s (%s)", attempt, max_attempts, nombre, numero)
             
             if attempt > 1:
+                send_metrics.increment("retries")
                 logger.debug("Resetting state for retry...")
                 reset_success = reset_to_chat_list(driver, wait, logger)
                 if not reset_success:
                     logger.warning("Could not reset completely, continuing...")
-                time.sleep(2)
-            
-            logger.debug("Looking for new chat button...")
-            new_chat = ensure_new_chat_button_available(driver, wait, logger)
-            
-            if new_chat is None:
-                logger.warning("Could not find new chat button")
-                continue
-                
-            try:
-                new_chat.click()
-            except:
-                driver.execute_script("arguments[0].click();", new_chat)
-            
-            logger.debug("New chat button clicked")
-            time.sleep(1)
-
-            logger.debug("Looking for search box...")
-            search_box = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div[contenteditable='true'][aria-placeholder='Buscar un nombre o número']"))
-            )
-            
-            search_box.click()
-            time.sleep(0.3)
-            search_box.clear()
-            time.sleep(0.3)
-            
-            try:
-                search_box.send_keys(Keys.CONTROL + "a")
-                time.sleep(0.2)
-                search_box.send_keys(Keys.DELETE)
-                time.sleep(0.2)
-            except:
-                pass
+                clock.mark("retry_reset")
             
-            logger.debug(f"Writing number: {numero}")
-
-            for char in numero:
-                search_box.send_keys(char)
-                time.sleep(0.01)
-
-            time.sleep(1.5)
-            
-            logger.debug("Looking for contact in results...")
-            contact_found = False
-            
-            contact_selectors = [
-                f"span[title*='{numero}']",
-                "div[data-testid='cell-frame-container']",
-                "div[role='listitem']",
-                "div[data-testid='chat']"
-            ]
+            chat_opened = None
+            prefilled = False
+            if open_mode == "link":
+                chat_opened = open_chat_via_link(driver, numero, logger, text=mensaje if prefill and not attachment else None)
+                if chat_opened is False:
+                    logger.warning("INVALID NUMBER - %s", numero)
+                    send_metrics.increment("invalid_numbers")
+                    invalid_numbers.add(numero)
+                    return finish("invalid", attempt)
+                if chat_opened is None:
+                    logger.debug("Deep link did not open the chat, falling back to search flow")
+                else:
+                    prefilled = prefill and not attachment
             
-            for selector in contact_selectors:
-                try:
-                    contacts = driver.find_elements(By.CSS_SELECTOR, selector)
-                    for contact in contacts:
-                        contact_html = contact.get_attribute('outerHTML') or ""
-                        contact_text = contact.get_attribute('textContent') or ""
-                        
-                        if numero in contact_html or numero in contact_text:
-                            driver.execute_script("arguments[0].click();", contact)
-                            contact_found = True
-                            logger.debug(f"Contact found and clicked with selector: {selector}")
-                            break
-                    
-                    if contact_found:
-                        break
-                        
-                except Exception as e:
-                    logger.debug(f"Error with selector {selector}: {e}")
+            if chat_opened is None:
+                chat_opened = open_chat_via_search(driver, wait, numero, logger)
+                if chat_opened is None:
+                    error = "ChatNotOpened"
+                    error_class = "chat_not_opened"
                     continue
-            
-            if not contact_found:
-                logger.debug("Contact not found in list, trying ENTER...")
-                search_box.send_keys(Keys.ENTER)
-                time.sleep(2)
-                
-                try:
-                    invalid_spans = driver.find_elements(By.CSS_SELECTOR, "span[dir='auto'][class='_ao3e']")
-                    for span in invalid_spans:
-                        span_text = span.get_attribute('textContent') or span.text
-                        if "No se encontraron resultados para" in span_text:
-                            logger.warning(f"INVALID NUMBER - {span_text}")
-                            return False
-                except:
-                    pass
-
-            time.sleep(2)
+                if chat_opened is False:
+                    send_metrics.increment("invalid_numbers")
+                    invalid_numbers.add(numero)
+                    return finish("invalid", attempt)
+            clock.mark("open_chat")
+
+            if not wait_for(driver, CONVERSATION_READY_SCRIPT, "conversation", logger):
+                raise TimeoutException("Conversation panel did not open")
             logger.debug("Chat opened, looking for message field")
+            outgoing_before = driver.execute_script(OUTGOING_COUNT_SCRIPT)
+            clock.mark("conversation_ready")
 
-            logger.debug("Looking for message field...")
-            
-            message_selectors = [
-                "div[contenteditable='true'][role='textbox'][data-lexical-editor='true']",
-                "div[contenteditable='true'][data-tab='10']",
-                "div[contenteditable='true'][aria-placeholder='Escribe un mensaje']",
-                "div[contenteditable='true'][aria-label*='Escribe a']"
-            ]
-            
-            sms_box = None
-            for selector in message_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    for element in elements:
-                        aria_placeholder = element.get_attribute('aria-placeholder') or ""
-                        aria_label = element.get_attribute('aria-label') or ""
-                        
-                        is_search_bar = (
-                            'buscar' in aria_placeholder.lower() or
-                            'search' in aria_placeholder.lower() or
-                            'buscar' in aria_label.lower() or
-                            'search' in aria_label.lower()
-                        )
-                        
-                        if not is_search_bar and element.is_displayed():
-                            sms_box = element
-                            logger.debug(f"Message field found with selector: {selector}")
-                            break
-                    
-                    if sms_box is not None:
-                        break
-                        
-                except Exception as e:
-                    logger.debug(f"Error with selector {selector}: {e}")
-                    continue
-            
-            if sms_box is None:
-                logger.debug("Using last resort method...")
-                try:
-                    chat_area = driver.find_element(By.CSS_SELECTOR, "div[data-testid='conversation-panel-body']")
-                    chat_area.click()
-                    time.sleep(0.5)
-                except:
-                    pass
-                
-                active_element = driver.switch_to.active_element
-                for char in mensaje:
-                    if char == '\n':
-                        active_element.send_keys(Keys.SHIFT, Keys.ENTER)
-                        time.sleep(0.05)
-                    else:
-                        active_element.send_keys(char)
-                        time.sleep(0.05)
-                
-                time.sleep(0.5)
-                active_element.send_keys(Keys.ENTER)
+            if attachment:
+                send_attachment(driver, attachment, mensaje, compose_mode, logger)
+                clock.mark("attach")
             else:
-                try:
-                    driver.execute_script("arguments[0].scrollIntoView(true);", sms_box)
-                    time.sleep(0.3)
-                    
-                    sms_box.click()
-                    time.sleep(0.3)
-                    sms_box.clear()
-                    
-                    logger.debug(f"Writing personalized message for {nombre}...")
-                    
-                    for char in mensaje:
-                        if char == '\n':
-                            sms_box.send_keys(Keys.SHIFT, Keys.ENTER)
-                            time.sleep(0.05)
-                        else:
-                            sms_box.send_keys(char)
-                            time.sleep(0.05)
-                    
-                    time.sleep(0.5)
-                    sms_box.send_keys(Keys.ENTER)
-                    
-                except Exception as e:
-                    logger.debug(f"Error writing to specific field: {e}")
+                logger.debug("Looking for message field...")
+                sms_box = find_message_box(driver, logger)
+                clock.mark("find_message_box")
+                
+                if sms_box is None:
+                    logger.debug("Using last resort method...")
                     try:
                         chat_area = driver.find_element(By.CSS_SELECTOR, "div[data-testid='conversation-panel-body']")
                         chat_area.click()
-                        time.sleep(0.5)
+                        wait_for(driver, COMPOSER_FOCUSED_SCRIPT, "composer", logger)
                     except:
                         pass
                     
                     active_element = driver.switch_to.active_element
-                    for char in mensaje:
-                        if char == '\n':
-                            active_element.send_keys(Keys.SHIFT, Keys.ENTER)
-                            time.sleep(0.05)
-                        else:
-                            active_element.send_keys(char)
-                            time.sleep(0.05)
-                    
-                    time.sleep(0.5)
+                    compose_message(driver, active_element, mensaje, compose_mode, logger, prefilled=prefilled)
                     active_element.send_keys(Keys.ENTER)
+                else:
+                    try:
+                        driver.execute_script("arguments[0].scrollIntoView(true);", sms_box)
+                        sms_box.click()
+                        wait_for(driver, COMPOSER_FOCUSED_SCRIPT, "composer", logger)
+                        if not prefilled:
+                            sms_box.clear()
+                        
+                        logger.debug("Writing personalized message for %s...", nombre)
+                        
+                        compose_message(driver, sms_box, mensaje, compose_mode, logger, prefilled=prefilled)
+                        sms_box.send_keys(Keys.ENTER)
+                        
+                    except Exception as e:
+                        logger.debug("Error writing to specific field: %s", e)
+                        try:
+                            chat_area = driver.find_element(By.CSS_SELECTOR, "div[data-testid='conversation-panel-body']")
+                            chat_area.click()
+                            wait_for(driver, COMPOSER_FOCUSED_SCRIPT, "composer", logger)
+                        except:
+                            pass
+                        
+                        active_element = driver.switch_to.active_element
+                        compose_message(driver, active_element, mensaje, compose_mode, logger, prefilled=prefilled)
+                        active_element.send_keys(Keys.ENTER)
+                clock.mark("compose")
             
-            time.sleep(2)
-            logger.info(f"SUCCESS - Personalized message sent to {nombre} ({numero}) on attempt {attempt}")
+            # No waiting for the ticks here: the delivery tracker checks pending
+            # messages from the chat list while the next contacts are sent
+            status_icon = driver.execute_script(OUTGOING_STATUS_SCRIPT, outgoing_before)
+            if status_icon is None:
+                logger.debug("Outgoing message not in chat yet for %s (%s), will check from chat list", nombre, numero)
+                send_metrics.increment("outgoing_not_seen")
+            delivery_tracker.track(numero, nombre, status_icon)
+            clock.mark("confirm")
+            pacer.success(clock.elapsed())
+            send_metrics.increment("sends_succeeded")
+            logger.info("SUCCESS - Personalized message sent to %s (%s) on attempt %s", nombre, numero, attempt)
             
             logger.debug("Preparing for next contact...")
-            return True
+            return finish("sent", attempt)
 
         except TimeoutException as e:
-            logger.warning(f"TIMEOUT - Attempt {attempt}/{max_attempts} failed for {nombre} ({numero})")
+            send_metrics.increment("timeouts")
+            pacer.failure()
+            error = type(e).__name__
+            error_class = "timeout"
+            logger.warning("TIMEOUT - Attempt %s/%s failed for %s (%s)", attempt, max_attempts, nombre, numero)
             if attempt < max_attempts:
-                logger.info("Retrying in 3 seconds...")
-                time.sleep(3)
-            else:
-                logger.error(f"FINAL FAILURE - Timeout for {nombre} ({numero})")
+                retry_delay = pacer.retry_delay(attempt)
+                logger.info("Retrying in %.0f seconds...", retry_delay)
+                time.sleep(retry_delay)
+            elif defer is None:
+                logger.error("FINAL FAILURE - Timeout for %s (%s)", nombre, numero)
                 
         except WebDriverException as e:
-            logger.warning(f"WEB ERROR - Attempt {attempt}/{max_attempts} failed for {nombre} ({numero})")
+            send_metrics.increment("webdriver_errors")
+            pacer.failure()
+            error = type(e).__name__
+            error_class = "browser"
+            logger.warning("WEB ERROR - Attempt %s/%s failed for %s (%s)", attempt, max_attempts, nombre, numero)
             if attempt < max_attempts:
-                logger.info("Retrying in 3 seconds...")
-                time.sleep(3)
-            else:
-                logger.error(f"FINAL FAILURE - Browser error for {nombre} ({numero})")
+                retry_delay = pacer.retry_delay(attempt)
+                logger.info("Retrying in %.0f seconds...", retry_delay)
+                time.sleep(retry_delay)
+            elif defer is None:
+                logger.error("FINAL FAILURE - Browser error for %s (%s)", nombre, numero)
                 
         except Exception as e:
-            logger.warning(f"UNEXPECTED ERROR - Attempt {attempt}/{max_attempts} failed for {nombre} ({numero}): {type(e).__name__}")
+            send_metrics.increment("unexpected_errors")
+            pacer.failure()
+            error = type(e).__name__
+            error_class = "unexpected"
+            logger.warning("UNEXPECTED ERROR - Attempt %s/%s failed for %s (%s): %s", attempt, max_attempts, nombre, numero, type(e).__name__)
             if attempt < max_attempts:
-                logger.info("Retrying in 3 seconds...")
-                time.sleep(3)
+                retry_delay = pacer.retry_delay(attempt)
+                logger.info("Retrying in %.0f seconds...", retry_delay)
+                time.sleep(retry_delay)
+            elif defer is None:
+                logger.error("FINAL FAILURE - Unexpected error for %s (%s): %s", nombre, numero, e)
+        
+        finally:
+            send_metrics.observe("attempt", clock.elapsed())
+
+    if defer is not None:
+        if defer(error_class):
+            logger.warning("DEFERRED - %s (%s) will be retried later (%s)", nombre, numero, error_class)
+            send_metrics.increment("sends_deferred")
+            return finish("deferred", max_attempts)
+        logger.error("FINAL FAILURE - %s for %s (%s), no retries left", error, nombre, numero)
+    send_metrics.increment("sends_failed")
+    return finish("failed", max_attempts)
+
+
+# WhatsApp Web forwards a message to at most 5 chats at once
+MAX_FORWARD_RECIPIENTS = 5
+
+# Failed forwards in a row after which the rest of the run is sent directly
+MAX_FORWARD_FAILURES = 3
+
+# Opens the forward dialog for the newest outgoing message, one step per call:
+# message menu, "Reenviar" item, forward button of the selection bar
+FORWARD_DIALOG_SCRIPT = """
+if (document.querySelector("div[role='dialog'] div[contenteditable='true']")) { return 'dialog'; }
+const forward = document.querySelector("footer span[data-icon='forward'], footer span[data-icon='forward-refreshed'], button[aria-label='Reenviar']");
+if (forward) { (forward.closest("button, [role='button']") || forward).click(); return null; }
+for (const item of document.querySelectorAll("div[role='application'] li, li[role='button'], div[role='menuitem']")) {
+    const label = (item.textContent || '').trim().toLowerCase();
+    if (label === 'reenviar' || label === 'forward') { item.click(); return null; }
+}
+const bubbles = document.querySelectorAll("div.message-out");
+if (!bubbles.length) { return 'no-message'; }
+// Opening the menu again too soon would close it
+if (Date.now() - (window.wasapyForwardMenuAt || 0) < 1000) { return null; }
+const bubble = bubbles[bubbles.length - 1];
+bubble.dispatchEvent(new MouseEvent('mouseover', {bubbles: true}));
+const menu = bubble.querySelector("span[data-icon='down-context'], span[data-icon='ic-chevron-down-menu'], div[aria-label='Menú contextual']");
+if (menu) {
+    (menu.closest("[role='button']") || menu).click();
+    window.wasapyForwardMenuAt = Date.now();
+}
+return null;
+"""
+
+# Picks the number in the forward dialog search results: 'picked', 'missing' or null while searching
+FORWARD_PICK_SCRIPT = """
+const dialog = document.querySelector("div[role='dialog']");
+if (!dialog) { return 'missing'; }
+const digits = arguments[0].replace(/\D/g, '');
+for (const item of dialog.querySelectorAll("div[role='listitem'], div[role='button'][data-testid='cell-frame-container'], div[data-testid='cell-frame-container']")) {
+    if ((item.textContent || '').replace(/\D/g, '').includes(digits)) {
+        const checkbox = item.querySelector("div[role='checkbox'], input[type='checkbox']");
+        if (checkbox && (checkbox.getAttribute('aria-checked') === 'true' || checkbox.checked)) { return 'picked'; }
+        (checkbox || item).click();
+        return 'picked';
+    }
+}
+for (const span of dialog.querySelectorAll("span")) {
+    const text = span.textContent || '';
+    if (text.includes('No se encontr') || text.includes('No results')) { return 'missing'; }
+}
+return null;
+"""
+
+FORWARD_SEND_SCRIPT = """
+const dialog = document.querySelector("div[role='dialog']");
+if (!dialog) { return 'sent'; }
+const send = dialog.querySelector("span[data-icon='send'], span[data-icon='wds-ic-send-filled'], div[aria-label='Enviar']");
+if (send) { (send.closest("[role='button'], button") || send).click(); }
+return null;
+"""
+
+
+def forward_message(driver, recipients, logger):
+    """
+    Forward the newest outgoing message of the open chat to several chats in
+    one forward dialog.
+
+    Only chats that the forward dialog finds (saved contacts and existing
+    chats) can be picked; the caller sends the others the normal way.
+
+    Parameters:
+        recipients (list): (numero, nombre) tuples, at most MAX_FORWARD_RECIPIENTS
+
+    Returns:
+        set: Numbers the message was forwarded to
+
+    Raises:
+        TimeoutException: If the forward dialog did not open or close
+    """
+    clock = send_metrics.clock()
+    if wait_for(driver, FORWARD_DIALOG_SCRIPT, "forward_dialog", logger) != "dialog":
+        raise TimeoutException("Forward dialog did not open")
+    search_box = driver.find_element(By.CSS_SELECTOR, "div[role='dialog'] div[contenteditable='true']")
+    clock.mark("forward_dialog")
+    
+    picked = set()
+    for numero, nombre in recipients:
+        search_box.send_keys(Keys.CONTROL + "a")
+        search_box.send_keys(Keys.DELETE)
+        search_box.send_keys(numero)
+        if wait_for(driver, FORWARD_PICK_SCRIPT, "search_results", logger, numero) == "picked":
+            picked.add(numero)
+        else:
+            logger.info("FORWARD - %s (%s) not found in the forward dialog, will send it directly", nombre, numero)
+    clock.mark("forward_pick")
+    
+    if not picked:
+        reset_via_escape(driver, logger)
+        return picked
+    
+    if not wait_for(driver, FORWARD_SEND_SCRIPT, "forward_dialog", logger):
+        raise TimeoutException("Forward dialog did not close")
+    clock.mark("forward_send")
+    return picked
+
+
+def create_driver(firefox_profile=None, headless=False, lean=False, browser="firefox"):
+    return get_browser(browser).create(firefox_profile, headless=headless, lean=lean)
+
+
+def driver_alive(driver):
+    try:
+        driver.current_url
+        return True
+    except:
+        return False
+
+
+def start_browser(firefox_profile, browser_options, logger):
+    """
+    Start the browser with the profile, open WhatsApp Web and wait for the login.
+
+    Raises:
+        BrowserStartError: If the browser does not start, WhatsApp Web asks for a QR scan or does not load
+    """
+    browser = browser_options.get("browser", "firefox").capitalize()
+    headless = browser_options.get("headless", False)
+    login_timeout = browser_options.get("login_timeout")
+    login_timeout = STEP_TIMEOUTS["login"] if login_timeout is None else login_timeout
+    try:
+        driver = create_driver(firefox_profile, headless=headless, lean=browser_options.get("lean", False), browser=browser_options.get("browser", "firefox"))
+    except WebDriverException as e:
+        raise BrowserStartError(f"{browser} did not start: {e.msg}")
+    logger.info("%s started%s", browser, f' with profile {firefox_profile}' if firefox_profile else '')
+    
+    try:
+        driver.get(WHATSAPP_URL)
+        login_state = wait_for_login(driver, logger, headless, login_timeout)
+    except WebDriverException:
+        login_state = None
+    
+    if login_state == "ready":
+        return driver
+    
+    try:
+        driver.quit()
+    except:
+        pass
+    if login_state == "qr" and headless:
+        raise BrowserStartError(f"Profile {firefox_profile} is not logged in to WhatsApp Web", qr_needed=True)
+    if login_state == "qr":
+        # In a visible browser the QR code could be scanned: the user ran out of time
+        raise BrowserStartError(f"The QR code was not scanned within {login_timeout} seconds, run again with a longer --login-timeout")
+    raise BrowserStartError(f"WhatsApp Web did not load within {login_timeout} seconds")
+
+
+def driver_pid(driver):
+    """
+    Process id of the driver service (geckodriver, chromedriver), or None
+    """
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+
+def recycle_tab(driver, logger):
+    """
+    Replace the WhatsApp Web tab with a fresh one, releasing the state of
+    every chat opened so far. The old tab is closed before WhatsApp Web is
+    loaded again, so the new tab does not compete with it for the session.
+
+    Returns:
+        bool: True when WhatsApp Web is logged in again in the new tab
+    """
+    try:
+        old_tab = driver.current_window_handle
+        driver.switch_to.new_window("tab")
+        new_tab = driver.current_window_handle
+        driver.switch_to.window(old_tab)
+        driver.close()
+        driver.switch_to.window(new_tab)
+        driver.get(WHATSAPP_URL)
+        # Nobody is waiting to scan a QR code in the middle of a run
+        return wait_for_login(driver, logger, headless=True) == "ready"
+    except WebDriverException as e:
+        logger.debug("Error recycling tab: %s", e)
+        return False
+
+
+def recycle_if_needed(supervisor, logger):
+    """
+    Between two contacts, recycle the tab or the browser if the watchdog
+    asks for it.
+
+    Raises:
+        BrowserStartError: If the browser cannot be started again
+    """
+    decision = watchdog.check(driver_pid(supervisor.driver))
+    if decision is None:
+        return
+    
+    action, reason = decision
+    logger.warning("RECYCLE %s - %s", action.upper(), reason)
+    with send_metrics.span("recycle"):
+        if action == "tab" and not recycle_tab(supervisor.driver, logger):
+            logger.warning("RECYCLE TAB - WhatsApp Web did not load in the new tab, restarting the browser")
+            action = "browser"
+        if action == "browser":
+            supervisor.recycle()
+    send_metrics.increment(f"recycle_{action}")
+    watchdog.recycled(action)
+
+
+def supervise_browser(firefox_profile, browser_options, logger, max_restarts=3):
+    return BrowserSupervisor(
+        lambda: start_browser(firefox_profile, browser_options, logger),
+        lambda driver: driver.quit(),
+        driver_alive,
+        max_restarts=max_restarts,
+        logger=logger,
+    )
+
+
+def send_supervised(supervisor, numero, nombre, mensaje, send_options, row_num=None, attachment=None, defer=None):
+    """
+    Send one contact; if the browser crashed during the send, restart it
+    with the same profile and send the contact again.
+
+    Parameters:
+        defer (callable): Defers a failed send for a later retry (see
+            send_message_with_retry); without it the send is retried right away
+
+    Raises:
+        BrowserStartError: If the browser cannot be restarted
+    """
+    max_attempts = 2
+    if defer is not None:
+        max_attempts = 1
+        # A send that failed because the browser crashed is sent again below, not deferred
+        defer_failure = defer
+        defer = lambda error_class: supervisor.alive() and defer_failure(error_class)
+    
+    success = send_message_with_retry(supervisor.driver, WebDriverWait(supervisor.driver, 30), numero, nombre, max_attempts=max_attempts, mensaje=mensaje, row_num=row_num, attachment=attachment, defer=defer, **send_options)
+    if success or supervisor.alive():
+        return success
+    
+    logging.getLogger(__name__).error("BROWSER CRASHED - While sending to %s (%s)", nombre, numero)
+    supervisor.restart()
+    send_metrics.increment("browser_restarts")
+    return send_message_with_retry(supervisor.driver, WebDriverWait(supervisor.driver, 30), numero, nombre, max_attempts=max_attempts, mensaje=mensaje, row_num=row_num, attachment=attachment, defer=defer, **send_options)
+
+
+def send_contact(supervisor, contact, send_options, logger, processed, worker_id=None, defer=None):
+    """
+    Wait for the pacer and send one contact (the processed-th of the run)
+
+    The row of a daemon work item is a (job id, row number, template name)
+    key, as jobs of different templates share the workers.
+    """
+    row_num, numero, nombre, mensaje, attachment = contact
+    if isinstance(row_num, tuple):
+        job_id, row_num, template_name = row_num
+        send_options = dict(send_options, template_name=template_name)
+    recycle_if_needed(supervisor, logger)
+    with send_metrics.span("pause"):
+        waited = pacer.wait()
+    if waited:
+        logger.debug("Paced %.1f seconds before next message (%.1f messages/minute)", waited, pacer.rate)
+    
+    if worker_id is None:
+        logger.info("PROCESSING %s - Number: %s, Name: %s", processed, numero, nombre)
+    else:
+        logger.info("WORKER %s - PROCESSING ROW %s - Number: %s, Name: %s", worker_id, row_num, numero, nombre)
+    start = time.perf_counter()
+    with send_metrics.span("contact"):
+        success = send_supervised(supervisor, numero, nombre, mensaje, send_options, row_num, attachment, defer)
+    watchdog.observe(time.perf_counter() - start)
+    return success
+
+
+def send_each(supervisor, contacts, send_options, logger, worker_id=None):
+    """
+    Send the contacts one by one.
+
+    A contact that fails for a transient reason is deferred to retry_queue
+    instead of being retried at once. It is sent again between later
+    contacts once its cool-down is over; the contacts still waiting after
+    the last one are sent at the end. The contacts iterable may yield None
+    when it has nothing to send yet (see take_work).
+
+    Yields:
+        (row_num, numero, nombre, success) once the outcome of a contact is final
+    """
+    end = object()
+    pending = iter(contacts)
+    remaining = True
+    processed = 0
+    
+    while remaining or retry_queue:
+        contact = retry_queue.pop_due()
+        if contact is not None:
+            logger.info("RETRY %s - %s (%s)", retry_queue.count(contact), contact[2], contact[1])
+        elif remaining:
+            contact = next(pending, end)
+            if contact is end:
+                remaining = False
+                continue
+        if contact is None:
+            if not remaining:
+                delay = retry_queue.wait_time()
+                logger.info("Waiting %.0f seconds for %s deferred contacts...", delay, len(retry_queue))
+                time.sleep(delay)
+            continue
+        
+        processed += 1
+        success = send_contact(supervisor, contact, send_options, logger, processed, worker_id, lambda error_class: retry_queue.defer(contact, error_class))
+        if not success and contact in retry_queue:
+            continue
+        
+        if retry_queue.finish(contact):
+            send_metrics.increment("retries_recovered" if success else "retries_exhausted")
+        yield contact[:3] + (success,)
+
+
+def take_work(work_queue):
+    """
+    Yield the contacts of a pool work queue until it sends None. While
+    deferred contacts wait, new work is only waited for until the next of
+    them is due, then None is yielded so send_each can send it.
+    """
+    while True:
+        try:
+            item = work_queue.get(timeout=retry_queue.wait_time())
+        except queue.Empty:
+            yield None
+            continue
+        if item is None:
+            return
+        yield item
+
+
+def send_forwarded(supervisor, contacts, send_options, batch_size, logger):
+    """
+    Send each distinct message once and forward it to the other contacts
+    with the same message, batch_size chats per forward dialog.
+
+    The message is sent normally to the first contact of a group; while its
+    chat is open, the message is forwarded to the next contacts. Contacts
+    the forward dialog does not find, and every contact after a failed
+    forward, are sent normally, and that chat becomes the new source.
+    After MAX_FORWARD_FAILURES failed forwards in a row, forwarding is
+    turned off for the rest of the run.
+
+    Yields:
+        (row_num, numero, nombre, success) after each contact
+    """
+    groups = group_by_message(contacts)
+    logger.info("Forward mode: %s distinct messages", len(groups))
+    processed = 0
+    failures = 0
+    
+    for group in groups:
+        pending = collections.deque(group)
+        source_open = False
+        while pending:
+            if not source_open or failures >= MAX_FORWARD_FAILURES:
+                contact = pending.popleft()
+                processed += 1
+                source_open = send_contact(supervisor, contact, send_options, logger, processed)
+                yield contact[:3] + (source_open,)
+                continue
+            
+            batch = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+            with send_metrics.span("pause"):
+                pacer.wait(messages=len(batch))
+            logger.info("FORWARDING to %s contacts: %s", len(batch), ', '.join(contact[1] for contact in batch))
+            
+            start = time.perf_counter()
+            try:
+                with send_metrics.span("forward"):
+                    forwarded = forward_message(supervisor.driver, [contact[1:3] for contact in batch], logger)
+            except WebDriverException as e:
+                logger.warning("FORWARD FAILED - %s, sending these contacts directly", type(e).__name__)
+                send_metrics.increment("forward_failed")
+                reset_to_chat_list(supervisor.driver, WebDriverWait(supervisor.driver, 30), logger)
+                forwarded = None
+            seconds = time.perf_counter() - start
+            if forwarded is None:
+                pacer.failure()
+                failures += 1
+                if failures == MAX_FORWARD_FAILURES:
+                    logger.warning("FORWARD - %s forwards failed in a row, sending the remaining contacts directly", failures)
+                forwarded = set()
             else:
-                logger.error(f"FINAL FAILURE - Unexpected error for {nombre} ({numero}): {e}")
+                pacer.success(seconds)
+                failures = 0
+            
+            missing = []
+            for contact in batch:
+                row_num, numero, nombre, mensaje, attachment = contact
+                if numero not in forwarded:
+                    missing.append(contact)
+                    continue
+                send_metrics.increment("forwarded")
+                delivery_tracker.track(numero, nombre)
+                result_log.record(
+                    row=row_num,
+                    numero=numero,
+                    nombre=nombre,
+                    template=send_options["template_name"],
+                    attempts=1,
+                    outcome="sent",
+                    error=None,
+                    attachment=attachment,
+                    via="forward",
+                    durations={"forward": round(seconds / len(batch), 3)},
+                )
+                processed += 1
+                logger.info("SUCCESS - Message forwarded to %s (%s)", nombre, numero)
+                yield row_num, numero, nombre, True
+            
+            if missing:
+                pending.extendleft(reversed(missing))
+                source_open = False
 
-    return False
+
+def read_contacts(csv_file, logger):
+    """
+    Stream the CSV file and yield (row_num, numero, nombre, row) for every complete row.
+    """
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        
+        for row_num, row in enumerate(reader, 1):
+            numero = row.get("Numero")
+            nombre = row.get("Nombre")
+            
+            if not numero or not nombre:
+                if logger is not None:
+                    logger.warning("ROW %s - Incomplete data: Numero='%s', Nombre='%s' - SKIPPING", row_num, numero, nombre)
+                continue
+            
+            yield row_num, numero, nombre, row
+
+
+def validate_campaign(csv_file, template, logger):
+    """
+    Check every complete CSV row against the template before the browser starts.
+
+    Returns:
+        bool: True if the campaign can be sent
+    """
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        fieldnames = csv.DictReader(f).fieldnames
+    
+    rows = ((row_num, row) for row_num, numero, nombre, row in read_contacts(csv_file, None))
+    errors, warnings = template.validate(fieldnames, rows)
+    
+    for warning in warnings:
+        logger.warning("TEMPLATE - %s", warning)
+    for error in errors[:20]:
+        logger.error("TEMPLATE - %s", error)
+    if len(errors) > 20:
+        logger.error("TEMPLATE - ... and %s more errors", len(errors) - 20)
+    
+    return not errors
+
+
+def count_pending(csv_file, country_code, sent_numbers):
+    """
+    Count the contacts a run will send with a quick pass over the CSV, using
+    the same filters as the run but without logging skipped rows.
+
+    Returns:
+        tuple: (contacts to send, skipped contacts by reason)
+    """
+    number_filter = NumberFilter(invalid_numbers, country_code)
+    pending = 0
+    already_sent = 0
+    for contact in number_filter.filter(read_contacts(csv_file, None)):
+        if contact[1] in sent_numbers:
+            already_sent += 1
+        else:
+            pending += 1
+    return pending, {**number_filter.skipped, "already sent in this campaign": already_sent}
+
+
+def log_plan(logger, history, pending, skipped, workers, pacing_options):
+    """
+    Log the forecast of a campaign (--plan) without starting the browser
+    """
+    forecast = history.forecast(pending, workers, pacing_options["max_rate"], pacing_options["max_per_hour"])
+    cap = f", at most {pacing_options['max_per_hour']}/hour per worker" if pacing_options["max_per_hour"] else ""
+    
+    logger.info("=" * 50)
+    logger.info("CAMPAIGN PLAN")
+    logger.info("Contacts to send: %s", pending)
+    for reason, count in skipped.items():
+        if count:
+            logger.info("Skipped (%s): %s", reason, count)
+    logger.info("Workers: %s - Pacing: %g-%g messages/minute%s", workers, pacing_options['min_rate'], pacing_options['max_rate'], cap)
+    logger.info("Expected duration: %s (%.1f messages/minute)", format_duration(forecast['seconds']), forecast['rate'])
+    times = forecast["contact_times"]
+    if times:
+        logger.info("Slow case: %s if every send is as slow as the slowest 10%% of past sends", format_duration(forecast['seconds_slow']))
+        logger.info("Time per contact: median %.1f s, 90%% under %.1f s", times['contact_p50'], times['contact_p90'])
+        logger.info("Mean time per outcome: %s", ", ".join(f"{outcome} {seconds:.1f} s" for outcome, seconds in sorted(times["outcome_means"].items())))
+    logger.info("Expected outcome: %s sent, %s failed, %s invalid numbers", forecast['sent'], forecast['failed'], forecast['invalid'])
+    if forecast["based_on"]:
+        logger.info("Based on the last %s runs (history: %s)", forecast['based_on'], history.path)
+    else:
+        logger.info("No run history yet (%s), assuming %s per contact", history.path, format_duration(DEFAULT_CONTACT_SECONDS))
+    logger.info("=" * 50)
 
 
-def main(csv_file, template_name="default", firefox_profile=None):
+def record_run(logger, history, campaign_id, total_contacts, successful_sends, failed_sends, workers, elapsed):
+    """
+    Add the finished run to the run history used by --plan
+    """
+    invalid = send_metrics.counters.get("invalid_numbers", 0)
+    contact = send_metrics.histograms.get("contact")
+    contact_mean = contact.sum / contact.count if contact and contact.count else 0.0
+    history.add(total_contacts, successful_sends, failed_sends - invalid, invalid, workers, elapsed, contact_mean, campaign=campaign_id)
+    try:
+        history.save()
+    except OSError as e:
+        logger.warning("Could not save run history: %s", e)
+
+
+def group_by_message(contacts):
+    """
+    Group rendered contacts by identical message and attachment, in order of
+    first appearance.
+
+    Reads all contacts into memory.
+
+    Returns:
+        list: Lists of (row_num, numero, nombre, mensaje, attachment)
+    """
+    groups = {}
+    for contact in contacts:
+        groups.setdefault(contact[3:], []).append(contact)
+    return list(groups.values())
+
+
+def render_messages(contacts, template):
+    """
+    Yield (row_num, numero, nombre, mensaje, attachment) with the message
+    already rendered and the attachment prepared for upload (or None).
+    """
+    for row_num, numero, nombre, row in contacts:
+        attachment = template.attachment(row)
+        if attachment:
+            attachment = media_cache.prepare(attachment)
+        yield row_num, numero, nombre, template.render(row), attachment
+
+
+def save_selector_cache(logger):
+    try:
+        selector_registry.save()
+    except OSError as e:
+        logger.warning("Could not save selector cache: %s", e)
+
+
+def export_metrics(logger, campaign_id, json_path=None, prom_path=None):
+    try:
+        if json_path:
+            send_metrics.write_json(json_path, campaign=campaign_id)
+            logger.info("Metrics written to %s", json_path)
+        if prom_path:
+            send_metrics.write_prometheus(prom_path, campaign=campaign_id)
+            logger.info("Prometheus metrics written to %s", prom_path)
+    except OSError as e:
+        logger.warning("Could not write metrics: %s", e)
+
+
+def skipped_counts(number_filter, journal):
+    return {**number_filter.skipped, "already sent in this campaign": journal.skipped}
+
+
+def check_deliveries(driver, logger, timeout=None):
+    """
+    Refresh the delivery status of pending messages; with a timeout, keep
+    checking until nothing is pending or the timeout expires
+    """
+    try:
+        with send_metrics.span("delivery_check"):
+            if timeout is None:
+                delivery_tracker.update(driver)
+            else:
+                logger.info("Checking delivery of %s pending messages (up to %s seconds)...", len(delivery_tracker.pending()), timeout)
+                delivery_tracker.finalize(driver, timeout)
+    except WebDriverException as e:
+        logger.debug("Could not check delivery status: %s", type(e).__name__)
+
+
+def log_summary(logger, total_contacts, successful_sends, failed_sends, worker_stats=None, skipped=None, deliveries=None):
+    logger.info("=" * 50)
+    logger.info("FINAL SUMMARY")
+    logger.info("Total contacts processed: %s", total_contacts)
+    logger.info("Messages sent successfully: %s", successful_sends)
+    logger.info("Failed messages: %s", failed_sends)
+    logger.info(f"Success rate: {(successful_sends/total_contacts*100):.1f}%" if total_contacts > 0 else "Success rate: 0%")
+    if not worker_stats:
+        logger.info(pacer.summary_line())
+    if any(media_cache.stats.values()):
+        logger.info(media_cache.summary_line())
+    if send_metrics.counters.get("forwarded"):
+        logger.info("Sent by forwarding: %s", send_metrics.counters['forwarded'])
+    if send_metrics.counters.get("sends_deferred"):
+        logger.info("Deferred sends: %s - Recovered: %s - Failed after retries: %s", send_metrics.counters['sends_deferred'], send_metrics.counters.get('retries_recovered', 0), send_metrics.counters.get('retries_exhausted', 0))
+    if send_metrics.counters.get("recycle_tab") or send_metrics.counters.get("recycle_browser"):
+        logger.info("Recycled: %s tabs, %s browsers", send_metrics.counters.get('recycle_tab', 0), send_metrics.counters.get('recycle_browser', 0))
+    
+    if deliveries:
+        logger.info("Delivery confirmed: %s - Pending: %s - Failed: %s", deliveries['confirmed'], deliveries['pending'], deliveries['failed'])
+    
+    for reason, count in (skipped or {}).items():
+        if count:
+            logger.info("Skipped (%s): %s", reason, count)
+    
+    if worker_stats:
+        for worker_id, stats in sorted(worker_stats.items()):
+            status = "QR NEEDED" if stats.get("qr_needed") else "CRASHED" if stats["crashed"] else "OK"
+            logger.info("Worker %s: %s sent, %s failed - %s", worker_id, stats['success'], stats['failed'], status)
+    
+    phase_lines = send_metrics.summary_lines()
+    if phase_lines:
+        logger.info("Phase timings:")
+        for line in phase_lines:
+            logger.info("  %s", line)
+    
+    selector_lines = selector_registry.summary_lines()
+    if selector_lines:
+        logger.info("Selector statistics:")
+        for line in selector_lines:
+            logger.info("  %s", line)
+    
+    logger.info("PROCESS COMPLETED")
+    logger.info("=" * 50)
+
+
+def worker_report(crashed, qr_needed=False):
+    return {
+        "crashed": crashed,
+        "qr_needed": qr_needed,
+        "deliveries": delivery_tracker.counts(),
+        "selector_stats": selector_registry.run_stats,
+        "metrics": send_metrics.to_dict(),
+    }
+
+
+def pool_worker(worker_id, firefox_profile, work_queue, result_queue, send_options, pacing_options, browser_options, delivery_timeout=30, max_restarts=3, results_path=None, campaign_id=None, recycle_options=None):
+    """
+    Worker process for pool mode: runs its own browser session and sends
+    contacts taken from the shared work queue until it gets None.
+
+    A crashed browser is restarted with the same profile and the contact is
+    sent again. A worker that cannot restart its browser stops taking
+    contacts; the contacts still in the queue are sent by the remaining
+    workers. Each worker paces its own account, so rates and hourly caps
+    apply per profile.
+    """
     logger = setup_logging()
-    logger.info("STARTING WhatsApp Bot")
-    logger.info(f"CSV File: {csv_file}")
-    logger.info(f"Message Template: {template_name}")
+    pacer.configure(**pacing_options)
+    watchdog.configure(**(recycle_options or {}))
+    selector_registry.load()
+    invalid_numbers.load()
+    if results_path:
+        result_log.open(results_path, campaign=campaign_id, worker=worker_id)
+    supervisor = supervise_browser(firefox_profile, browser_options, logger, max_restarts)
+    
+    try:
+        clock = send_metrics.clock()
+        try:
+            supervisor.start()
+        except BrowserStartError as e:
+            if not e.qr_needed:
+                raise
+            logger.error("WORKER %s - QR NEEDED - %s", worker_id, e)
+            result_queue.put(("done", worker_id, worker_report(crashed=True, qr_needed=True)))
+            return
+        clock.mark("startup")
+        logger.info("WORKER %s - WhatsApp Web ready", worker_id)
+        
+        for row_num, numero, nombre, success in send_each(supervisor, take_work(work_queue), send_options, logger, worker_id):
+            result_queue.put(("result", worker_id, (row_num, numero, nombre, success)))
+            check_deliveries(supervisor.driver, logger)
+        
+        check_deliveries(supervisor.driver, logger, delivery_timeout)
+        result_queue.put(("done", worker_id, worker_report(crashed=False)))
+        
+    except Exception as e:
+        logger.error("WORKER %s CRASHED - %s: %s", worker_id, type(e).__name__, e)
+        for contact in retry_queue.drain():
+            result_queue.put(("result", worker_id, contact[:3] + (False,)))
+        result_queue.put(("done", worker_id, worker_report(crashed=True)))
+        
+    finally:
+        supervisor.stop()
+        result_log.close()
+        stop_logging()
+
+
+def run_pool(contacts, firefox_profiles, send_options, pacing_options, browser_options, journal, logger, delivery_timeout=30, max_restarts=3, results_path=None, total=None, recycle_options=None):
+    """
+    Send the contacts with one worker process per browser profile.
+
+    Rows are streamed into a shared queue, so faster workers take more
+    contacts; results are journaled and aggregated into a single summary.
+
+    Returns:
+        tuple: (stats per worker, seconds from the start to the last result)
+    """
+    work_queue = multiprocessing.Queue(maxsize=len(firefox_profiles) * 2)
+    result_queue = multiprocessing.Queue()
+    worker_stats = {}
+    workers = []
+    
+    for worker_id, firefox_profile in enumerate(firefox_profiles, 1):
+        worker_stats[worker_id] = {"success": 0, "failed": 0, "crashed": False, "qr_needed": False, "deliveries": {}}
+        process = multiprocessing.Process(
+            target=pool_worker,
+            args=(worker_id, firefox_profile, work_queue, result_queue, send_options, pacing_options, browser_options, delivery_timeout, max_restarts, results_path, journal.campaign_id, recycle_options),
+        )
+        process.start()
+        workers.append(process)
+    logger.info("Started %s workers", len(workers))
+    
+    finished = set()
+    started = time.time()
+    progress = {"done": 0, "last": started}
+    
+    def collect(timeout=0):
+        while True:
+            try:
+                kind, worker_id, value = result_queue.get(timeout=timeout) if timeout else result_queue.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "result":
+                row_num, numero, nombre, success = value
+                worker_stats[worker_id]["success" if success else "failed"] += 1
+                journal.record(row_num, numero, nombre, "sent" if success else "failed", worker=worker_id)
+                progress["done"] += 1
+                progress["last"] = time.time()
+                if total:
+                    remaining = estimate_remaining(progress["done"], total, progress["last"] - started)
+                    logger.info("PROGRESS %s/%s - ETA %s", progress['done'], total, format_duration(remaining))
+            else:
+                finished.add(worker_id)
+                worker_stats[worker_id]["crashed"] = value["crashed"]
+                worker_stats[worker_id]["qr_needed"] = value["qr_needed"]
+                worker_stats[worker_id]["deliveries"] = value["deliveries"]
+                selector_registry.merge(value["selector_stats"])
+                send_metrics.merge(value["metrics"])
+            timeout = 0
+    
+    def put(item):
+        while True:
+            collect()
+            if len(finished) == len(workers):
+                return False
+            try:
+                work_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+    
+    try:
+        for item in contacts:
+            if not put(item):
+                logger.error("All workers stopped, remaining contacts were not sent")
+                break
+    finally:
+        for _ in workers:
+            if not put(None):
+                break
+    
+    while len(finished) < len(workers):
+        collect(timeout=1)
+        if not any(process.is_alive() for process in workers):
+            collect()
+            break
+    
+    for process in workers:
+        process.join()
+    
+    for worker_id in range(1, len(workers) + 1):
+        if worker_id not in finished:
+            worker_stats[worker_id]["crashed"] = True
+    
+    return worker_stats, progress["last"] - started
+
+
+def collect_replies(csv_file, firefox_profile=None, campaign_id=None, country_code=DEFAULT_COUNTRY_CODE, headless=False, lean=False, login_timeout=None, max_restarts=3, replies_path=DEFAULT_REPLIES_PATH, state_path=DEFAULT_STATE_PATH, browser="firefox"):
+    """
+    Collect-replies mode: write the new incoming messages of the campaign
+    contacts to replies_path, without sending anything.
+
+    Each profile is opened in turn. Its chat list is read one scroll page
+    per script call and only unread chats of campaign contacts are opened;
+    messages up to the high-water mark of the contact (state_path) are not
+    written again.
+    """
+    logger = setup_logging()
+    logger.info("STARTING WhatsApp Bot reply collection")
+    logger.info("CSV File: %s", csv_file)
+    
+    browser_options = {
+        "headless": headless,
+        "lean": lean,
+        "browser": browser,
+        "login_timeout": login_timeout,
+    }
+    
+    try:
+        get_browser(browser)
+        number_filter = NumberFilter(invalid_numbers, country_code)
+        contacts = {numero: nombre for row_num, numero, nombre, row in number_filter.filter(read_contacts(csv_file, logger))}
+    except FileNotFoundError:
+        logger.error("CRITICAL ERROR - File not found: %s", csv_file)
+        sys.exit(1)
+    except ValueError as e:
+        logger.error("CRITICAL ERROR - %s", e)
+        sys.exit(1)
+    
+    campaign = campaign_id or campaign_id_from_csv(csv_file)
+    collector = ReplyCollector(contacts, state_path, logger)
+    collector.load()
+    writer = ReplyWriter(replies_path)
+    logger.info("Campaign: %s - %s contacts (replies: %s, marks: %s)", campaign, len(contacts), replies_path, state_path)
+    selector_registry.load()
+    
+    replied = 0
+    collected = 0
+    qr_needed = False
+    for firefox_profile in ([firefox_profile] if isinstance(firefox_profile, str) else list(firefox_profile or [None])):
+        supervisor = supervise_browser(firefox_profile, browser_options, logger, max_restarts)
+        try:
+            supervisor.start()
+        except BrowserStartError as e:
+            logger.error("%s - %s", 'QR NEEDED' if e.qr_needed else 'BROWSER ERROR', e)
+            qr_needed = qr_needed or e.qr_needed
+            continue
+        
+        try:
+            driver = supervisor.driver
+            unread = collector.scan(driver)
+            logger.info("Unread chats of campaign contacts: %s", len(unread))
+            
+            for numero, nombre, count in unread:
+                wait = WebDriverWait(driver, 30)
+                try:
+                    opened = open_chat_via_search(driver, wait, numero, logger)
+                    if opened and wait_for(driver, CONVERSATION_READY_SCRIPT, "conversation", logger):
+                        records = collector.read_chat(driver, numero)
+                        writer.write(records, campaign=campaign)
+                        collector.save()
+                        if records:
+                            replied += 1
+                            collected += len(records)
+                        logger.info("REPLIES - %s (%s): %s new messages", nombre, numero, len(records))
+                    else:
+                        logger.warning("REPLIES - Could not open chat of %s (%s)", nombre, numero)
+                except (TimeoutException, WebDriverException) as e:
+                    logger.warning("REPLIES - Error reading chat of %s (%s): %s", nombre, numero, e)
+                
+                if not supervisor.alive():
+                    logger.error("BROWSER CRASHED - While reading replies, skipping the rest of this profile")
+                    break
+                reset_to_chat_list(driver, wait, logger)
+        except WebDriverException as e:
+            logger.error("BROWSER ERROR - %s", e)
+        finally:
+            supervisor.stop()
+    
+    save_selector_cache(logger)
+    logger.info("=" * 50)
+    logger.info("Replies collected: %s messages from %s contacts", collected, replied)
+    logger.info("=" * 50)
+    if qr_needed:
+        sys.exit(EXIT_QR_NEEDED)
+
+
+def schedule_campaign(csv_file, template_name="default", campaign_id=None, resume=False, column_map=None, country_code=DEFAULT_COUNTRY_CODE, attachment=None, schedule_path=DEFAULT_SCHEDULE_PATH, priority=0, not_before=None, window=None, daily_quota=None):
+    """
+    Add a CSV campaign to the schedule store instead of sending it now; the
+    scheduler (run_scheduler) sends it when it is due.
+
+    Rows are validated, filtered and rendered as in a normal run, so the
+    store holds the final messages.
+
+    Parameters:
+        not_before (str): Local date and time before which nothing is sent, e.g. "2025-10-20 09:00"
+        window (str): Daily sending window "HH:MM-HH:MM"
+        daily_quota (int): Most messages of this campaign per day
+    """
+    logger = setup_logging()
+    logger.info("SCHEDULING CSV File: %s", csv_file)
+    
+    try:
+        start = None
+        if not_before:
+            try:
+                start = datetime.fromisoformat(not_before).timestamp()
+            except ValueError:
+                raise ValueError(f"Invalid not-before time '{not_before}', expected YYYY-MM-DD HH:MM")
+        if window:
+            parse_window(window)
+        template = CompiledTemplate(template_name, column_map, attachment)
+        if not validate_campaign(csv_file, template, logger):
+            logger.error("CRITICAL ERROR - CSV file does not match the template, nothing was scheduled")
+            sys.exit(1)
+    except FileNotFoundError:
+        logger.error("CRITICAL ERROR - File not found: %s", csv_file)
+        sys.exit(1)
+    except ValueError as e:
+        logger.error("CRITICAL ERROR - %s", e)
+        sys.exit(1)
     
-    logger.info("Configuring Firefox...")
-    options = Options()
-    options.add_argument("--user-agent=Mozilla/5.0")
+    journal = SendJournal(campaign_id or campaign_id_from_csv(csv_file))
+    sent_numbers = journal.sent_numbers() if resume else set()
+    invalid_numbers.load()
+    number_filter = NumberFilter(invalid_numbers, country_code, logger)
     
-    if firefox_profile:
-        options.add_argument("-profile")
-        options.add_argument(firefox_profile)
+    with SendSchedule(schedule_path) as schedule:
+        if schedule.active(journal.campaign_id):
+            logger.error("CRITICAL ERROR - Campaign %s is already scheduled and not finished", journal.campaign_id)
+            sys.exit(1)
+        
+        contacts = render_messages(journal.pending(number_filter.filter(read_contacts(csv_file, logger)), sent_numbers), template)
+        try:
+            job_id, total = schedule.add_job(journal.campaign_id, template_name, contacts, priority=priority, not_before=start, window=window, daily_quota=daily_quota)
+        except ValueError as e:
+            logger.error("CRITICAL ERROR - %s", e)
+            sys.exit(1)
+    
+    logger.info("JOB %s - %s messages scheduled (campaign %s, priority %s)", job_id, total, journal.campaign_id, priority)
+    if not_before:
+        logger.info("Not before: %s", not_before)
+    if window or daily_quota:
+        logger.info("Sending window: %s - Daily quota: %s", window or 'all day', daily_quota or 'none')
+    for reason, count in skipped_counts(number_filter, journal).items():
+        if count:
+            logger.info("Skipped (%s): %s", reason, count)
+
+
+def run_scheduler(firefox_profile=None, schedule_path=DEFAULT_SCHEDULE_PATH, compose_mode="paste", open_mode="search", prefill=False, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE, max_per_hour=None, max_per_day=None, delivery_timeout=30, headless=False, lean=False, login_timeout=None, max_restarts=3, metrics_json="wasapy_metrics.json", metrics_prom=None, results_path=DEFAULT_RESULTS_PATH, browser="firefox", recycle_memory=DEFAULT_MAX_MEMORY_MB, recycle_drift=DEFAULT_MAX_DRIFT, recycle_every=0):
+    """
+    Scheduler mode: keep one logged-in browser and send the jobs of the
+    schedule store as they become due, until stopped.
+
+    Sends are taken one at a time by priority, not-before time, sending
+    window and daily quotas (see send_schedule.py). A failed send is moved
+    to a later time within the retry limits instead of being retried at
+    once. Outcomes are stored in the schedule and journaled under the
+    job's campaign, so the store can be added to and the scheduler
+    restarted at any time.
+    """
+    logger = setup_logging()
+    logger.info("STARTING WhatsApp Bot scheduler (store: %s)", schedule_path)
+    
+    send_options = {
+        "compose_mode": compose_mode,
+        "open_mode": open_mode,
+        "prefill": prefill,
+    }
+    pacing_options = {
+        "min_rate": min_rate,
+        "max_rate": max_rate,
+        "max_per_hour": max_per_hour,
+    }
+    browser_options = {
+        "headless": headless,
+        "lean": lean,
+        "browser": browser,
+        "login_timeout": login_timeout,
+    }
+    recycle_options = {
+        "max_memory_mb": recycle_memory,
+        "max_drift": recycle_drift,
+        "recycle_every": recycle_every,
+    }
+    
+    try:
+        pacer.configure(**pacing_options)
+        watchdog.configure(**recycle_options)
+        get_browser(browser)
+    except ValueError as e:
+        logger.error("CRITICAL ERROR - %s", e)
+        sys.exit(1)
+    
+    firefox_profiles = [firefox_profile] if isinstance(firefox_profile, str) else list(firefox_profile or [])
+    if len(firefox_profiles) > 1:
+        logger.error("CRITICAL ERROR - Scheduler mode uses a single browser profile")
+        sys.exit(1)
+    
+    selector_registry.load()
+    invalid_numbers.load()
+    schedule = SendSchedule(schedule_path).open()
+    for job in schedule.jobs():
+        if job["state"] != "done":
+            logger.info("JOB %s - campaign %s, priority %s: %s/%s sent", job['id'], job['campaign'], job['priority'], job['sent'], job['total'])
+    
+    supervisor = supervise_browser(firefox_profiles[0] if firefox_profiles else None, browser_options, logger, max_restarts)
+    if results_path:
+        result_log.open(results_path)
+    journals = {}
+    successful_sends = 0
+    failed_sends = 0
+    exit_code = 0
+    
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)
+    
+    try:
+        try:
+            supervisor.start()
+        except BrowserStartError as e:
+            if e.qr_needed:
+                logger.error("QR NEEDED - %s, run once without --headless and scan the QR code", e)
+                sys.exit(EXIT_QR_NEEDED)
+            logger.error("CRITICAL ERROR - %s", e)
+            sys.exit(1)
+        logger.info("WhatsApp Web logged in")
+        
+        idle = False
+        while True:
+            job, send, wait = schedule.next_due(max_per_day)
+            if job is None:
+                wait = SCHEDULER_POLL if wait is None else min(wait, SCHEDULER_POLL)
+                if not idle:
+                    logger.info("Nothing due, waiting for scheduled sends (next check in %.0f seconds)...", wait)
+                    idle = True
+                check_deliveries(supervisor.driver, logger)
+                time.sleep(wait)
+                continue
+            idle = False
+            
+            deferred = False
+            
+            def defer(error_class):
+                nonlocal deferred
+                deferred = schedule.defer(send["id"], error_class)
+                return deferred
+            
+            # Deferred sends are not counted, so the number is the contact's place among the finished ones
+            contact = (send["row"], send["numero"], send["nombre"], send["mensaje"], send["attachment"])
+            success = send_contact(supervisor, contact, dict(send_options, template_name=job["template"]), logger, successful_sends + failed_sends + 1, defer=defer)
+            if deferred:
+                continue
+            
+            job = schedule.record(send["id"], success)
+            if send["retries"]:
+                send_metrics.increment("retries_recovered" if success else "retries_exhausted")
+            if job["campaign"] not in journals:
+                journals[job["campaign"]] = SendJournal(job["campaign"]).open()
+            journals[job["campaign"]].record(send["row"], send["numero"], send["nombre"], "sent" if success else "failed", job=job["id"])
+            if success:
+                successful_sends += 1
+            else:
+                failed_sends += 1
+            if job["state"] == "done":
+                journals.pop(job["campaign"]).close()
+                logger.info("JOB %s DONE - campaign %s: %s sent, %s failed", job['id'], job['campaign'], job['sent'], job['failed'])
+            check_deliveries(supervisor.driver, logger)
+    
+    except KeyboardInterrupt:
+        logger.info("Stopping scheduler...")
+        if supervisor.driver is not None:
+            check_deliveries(supervisor.driver, logger, delivery_timeout)
+    except BrowserStartError as e:
+        logger.error("CRITICAL ERROR - %s, the remaining sends stay scheduled", e)
+        exit_code = 1
+    finally:
+        for journal in journals.values():
+            journal.close()
+        schedule.close()
+        save_selector_cache(logger)
+        result_log.close()
+        supervisor.stop()
+        logger.info("Browser closed")
+        log_summary(logger, successful_sends + failed_sends, successful_sends, failed_sends, deliveries=delivery_tracker.counts())
+        export_metrics(logger, "scheduler", metrics_json, metrics_prom)
+    if exit_code:
+        sys.exit(exit_code)
+
 
+def run_daemon(firefox_profile=None, compose_mode="paste", open_mode="search", prefill=False, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE, max_per_hour=None, country_code=DEFAULT_COUNTRY_CODE, delivery_timeout=30, headless=False, lean=False, login_timeout=None, max_restarts=3, port=DEFAULT_PORT, socket_path=None, metrics_json="wasapy_metrics.json", metrics_prom=None, results_path=DEFAULT_RESULTS_PATH, browser="firefox", recycle_memory=DEFAULT_MAX_MEMORY_MB, recycle_drift=DEFAULT_MAX_DRIFT, recycle_every=0):
+    """
+    Daemon mode: keep one logged-in browser per profile running and send the
+    jobs submitted through the local job API (see daemon.py) until stopped.
+
+    Jobs are validated, filtered and rendered in this process as they are
+    submitted; their messages go through the same work queue and pool
+    workers as pool mode. Results are journaled under the job's campaign.
+    """
+    logger = setup_logging()
+    logger.info("STARTING WhatsApp Bot daemon")
+    
+    send_options = {
+        "compose_mode": compose_mode,
+        "open_mode": open_mode,
+        "prefill": prefill,
+    }
+    pacing_options = {
+        "min_rate": min_rate,
+        "max_rate": max_rate,
+        "max_per_hour": max_per_hour,
+    }
+    browser_options = {
+        "headless": headless,
+        "lean": lean,
+        "browser": browser,
+        "login_timeout": login_timeout,
+    }
+    recycle_options = {
+        "max_memory_mb": recycle_memory,
+        "max_drift": recycle_drift,
+        "recycle_every": recycle_every,
+    }
+    
     try:
-        driver = webdriver.Firefox(options=options)
-        logger.info("Firefox started successfully")
+        pacer.configure(**pacing_options)
+        watchdog.configure(**recycle_options)
+        get_browser(browser)
+    except ValueError as e:
+        logger.error("CRITICAL ERROR - %s", e)
+        sys.exit(1)
+    
+    selector_registry.load()
+    
+    firefox_profiles = [firefox_profile] if isinstance(firefox_profile, str) else list(firefox_profile or [None])
+    work_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    workers = {}
+    
+    for worker_id, profile in enumerate(firefox_profiles, 1):
+        process = multiprocessing.Process(
+            target=pool_worker,
+            args=(worker_id, profile, work_queue, result_queue, send_options, pacing_options, browser_options, delivery_timeout, max_restarts, results_path, None, recycle_options),
+        )
+        process.start()
+        workers[worker_id] = process
+    logger.info("Started %s workers", len(workers))
+    
+    jobs = JobStore()
+    journals = {}
+    job_campaigns = {}
+    journals_lock = threading.Lock()
+    invalid_numbers_lock = threading.Lock()
+    finished = set()
+    qr_needed = set()
+    stopping = threading.Event()
+    
+    def submit_job(job_id, spec):
+        if len(finished) == len(workers):
+            raise RuntimeError("No sender is running")
+        
+        template = CompiledTemplate(spec.get("template", "default"), spec.get("map"), spec.get("attachment"))
+        # Reloaded per job for the numbers the workers found invalid meanwhile
+        with invalid_numbers_lock:
+            invalid_numbers.load()
+        number_filter = NumberFilter(invalid_numbers, str(spec.get("country_code", country_code)), logger)
+        
+        if spec.get("csv"):
+            if not validate_campaign(spec["csv"], template, logger):
+                raise ValueError("CSV file does not match the template")
+            contacts = read_contacts(spec["csv"], logger)
+            campaign_id = spec.get("campaign") or campaign_id_from_csv(spec["csv"])
+        elif spec.get("numero"):
+            row = {"Numero": str(spec["numero"]), "Nombre": str(spec.get("nombre", ""))}
+            row.update({column: str(value) for column, value in (spec.get("variables") or {}).items()})
+            errors, warnings = template.validate(list(row), [(1, row)])
+            if errors:
+                raise ValueError("; ".join(errors))
+            contacts = [(1, row["Numero"], row["Nombre"], row)]
+            campaign_id = spec.get("campaign") or "daemon"
+        else:
+            raise ValueError("Job needs 'csv' or 'numero'")
         
-        logger.info("Navigating to WhatsApp Web...")
-        driver.get("https://web.whatsapp.com/")
+        reader = SendJournal(campaign_id)
+        sent_numbers = reader.sent_numbers() if spec.get("resume") else set()
+        items = list(render_messages(reader.pending(number_filter.filter(contacts), sent_numbers), template))
+        
+        with journals_lock:
+            if items and campaign_id not in journals:
+                journals[campaign_id] = SendJournal(campaign_id).open()
+            job_campaigns[job_id] = campaign_id
+        
+        jobs.queued(job_id, len(items), skipped_counts(number_filter, reader))
+        for row_num, numero, nombre, mensaje, attachment in items:
+            work_queue.put(((job_id, row_num, template.name), numero, nombre, mensaje, attachment))
+        logger.info("JOB %s - %s messages queued (campaign %s)", job_id, len(items), campaign_id)
+    
+    def health():
+        try:
+            queued_messages = work_queue.qsize()
+        except NotImplementedError:
+            queued_messages = None
+        return {
+            "workers": len(workers),
+            "workers_running": len(workers) - len(finished),
+            "qr_needed": sorted(qr_needed),
+            "queued_messages": queued_messages,
+        }
+    
+    def collect():
+        while len(finished) < len(workers):
+            try:
+                kind, worker_id, value = result_queue.get(timeout=1)
+            except queue.Empty:
+                for worker_id, process in workers.items():
+                    if not process.is_alive():
+                        finished.add(worker_id)
+                continue
+            
+            if kind == "result":
+                (job_id, row_num, _), numero, nombre, success = value
+                with journals_lock:
+                    journal = journals[job_campaigns[job_id]]
+                    journal.record(row_num, numero, nombre, "sent" if success else "failed", worker=worker_id, job=job_id)
+                    if jobs.record(job_id, success):
+                        journal.sync()
+                        job = jobs.get(job_id)
+                        logger.info("JOB %s DONE - %s sent, %s failed", job_id, job['sent'], job['failed'])
+            else:
+                finished.add(worker_id)
+                if value["qr_needed"]:
+                    qr_needed.add(worker_id)
+                selector_registry.merge(value["selector_stats"])
+                send_metrics.merge(value["metrics"])
+        if not stopping.is_set():
+            logger.error("All workers stopped, the daemon cannot send any more messages")
+    
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+    
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)
+    
+    server = start_server(jobs, submit_job, health, port=port, socket_path=socket_path)
+    logger.info("Job API listening on %s", socket_path or f'http://127.0.0.1:{port}')
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping daemon, waiting for queued messages to finish...")
+    finally:
+        stopping.set()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        for _ in workers:
+            work_queue.put(None)
+        for process in workers.values():
+            process.join()
+        collector.join(timeout=5)
         
-        wait = WebDriverWait(driver, 30)
-        logger.info("WebDriverWait configured (30 seconds)")
+        for journal in journals.values():
+            journal.close()
+        save_selector_cache(logger)
+        for state, count in sorted(jobs.counts().items()):
+            logger.info("Jobs %s: %s", state, count)
+        export_metrics(logger, "daemon", metrics_json, metrics_prom)
 
-        print("\nScan the QR code in WhatsApp Web...")
-        print("If you already have an active session, just press enter:")
-        input("Press ENTER after logging into WhatsApp Web: ")
-        logger.info("User confirmed login")
+
+def main(csv_file, template_name="default", firefox_profile=None, compose_mode="paste", open_mode="search", prefill=False, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE, max_per_hour=None, campaign_id=None, resume=False, column_map=None, metrics_json="wasapy_metrics.json", metrics_prom=None, country_code=DEFAULT_COUNTRY_CODE, delivery_timeout=30, headless=False, lean=False, login_timeout=None, max_restarts=3, results_path=DEFAULT_RESULTS_PATH, history_path=DEFAULT_HISTORY_PATH, plan=False, workers=None, forward=0, attachment=None, browser="firefox", recycle_memory=DEFAULT_MAX_MEMORY_MB, recycle_drift=DEFAULT_MAX_DRIFT, recycle_every=0):
+    logger = setup_logging()
+    logger.info("STARTING WhatsApp Bot")
+    logger.info("CSV File: %s", csv_file)
+    logger.info("Message Template: %s", template_name)
+    if attachment:
+        logger.info("Attachment: %s", attachment)
+    logger.info("Compose Mode: %s", compose_mode)
+    logger.info("Open Mode: %s%s", open_mode, ' (pre-filled text)' if prefill and open_mode == 'link' else '')
+    if forward:
+        logger.info("Forward Mode: identical messages forwarded to %s chats at a time", forward)
+    
+    send_options = {
+        "template_name": template_name,
+        "compose_mode": compose_mode,
+        "open_mode": open_mode,
+        "prefill": prefill,
+    }
+    pacing_options = {
+        "min_rate": min_rate,
+        "max_rate": max_rate,
+        "max_per_hour": max_per_hour,
+    }
+    browser_options = {
+        "headless": headless,
+        "lean": lean,
+        "browser": browser,
+        "login_timeout": login_timeout,
+    }
+    recycle_options = {
+        "max_memory_mb": recycle_memory,
+        "max_drift": recycle_drift,
+        "recycle_every": recycle_every,
+    }
+    
+    try:
+        pacer.configure(**pacing_options)
+        watchdog.configure(**recycle_options)
+        get_browser(browser)
+        if not 0 <= forward <= MAX_FORWARD_RECIPIENTS:
+            raise ValueError(f"Forward batch size must be between 0 (off) and {MAX_FORWARD_RECIPIENTS}, got {forward}")
+        template = CompiledTemplate(template_name, column_map, attachment)
+        if not validate_campaign(csv_file, template, logger):
+            logger.error("CRITICAL ERROR - CSV file does not match the template, nothing was sent")
+            sys.exit(1)
+    except FileNotFoundError:
+        logger.error("CRITICAL ERROR - File not found: %s", csv_file)
+        sys.exit(1)
+    except ValueError as e:
+        logger.error("CRITICAL ERROR - %s", e)
+        sys.exit(1)
+    
+    selector_registry.load()
+    
+    journal = SendJournal(campaign_id or campaign_id_from_csv(csv_file))
+    logger.info("Campaign: %s (journal: %s)", journal.campaign_id, journal.path)
+    
+    sent_numbers = set()
+    if resume:
+        sent_numbers = journal.sent_numbers()
+        logger.info("Resuming campaign - %s numbers already sent will be skipped", len(sent_numbers))
+    
+    invalid_numbers.load()
+    number_filter = NumberFilter(invalid_numbers, country_code, logger)
+    logger.info("Known invalid numbers: %s (cache: %s)", len(invalid_numbers.numbers), invalid_numbers.path)
+    
+    firefox_profiles = [firefox_profile] if isinstance(firefox_profile, str) else list(firefox_profile or [])
+    if forward and len(firefox_profiles) > 1 and not plan:
+        logger.error("CRITICAL ERROR - Forward mode uses a single browser profile")
+        sys.exit(1)
+    history = RunHistory(history_path)
+    history.load()
+    total_pending, planned_skips = count_pending(csv_file, country_code, sent_numbers)
+    
+    if plan:
+        if results_path:
+            history.load_contacts(results_path)
+        log_plan(logger, history, total_pending, planned_skips, workers or max(1, len(firefox_profiles)), pacing_options)
+        return
+    
+    forecast = history.forecast(total_pending, max(1, len(firefox_profiles)), max_rate, max_per_hour)
+    logger.info("Contacts to send: %s - expected duration %s", total_pending, format_duration(forecast['seconds']))
+    
+    logger.info("Reading CSV file: %s", csv_file)
+    contacts = read_contacts(csv_file, logger)
+    contacts = number_filter.filter(contacts)
+    contacts = journal.pending(contacts, sent_numbers)
+    contacts = render_messages(contacts, template)
+    
+    if len(firefox_profiles) > 1:
+        logger.info("Pool mode with %s browser profiles", len(firefox_profiles))
+        try:
+            with journal:
+                worker_stats, elapsed = run_pool(contacts, firefox_profiles, send_options, pacing_options, browser_options, journal, logger, delivery_timeout, max_restarts, results_path, total_pending, recycle_options)
+        except FileNotFoundError:
+            logger.error("CRITICAL ERROR - File not found: %s", csv_file)
+            sys.exit(1)
+        
+        save_selector_cache(logger)
+        successful_sends = sum(stats["success"] for stats in worker_stats.values())
+        failed_sends = sum(stats["failed"] for stats in worker_stats.values())
+        if history_path:
+            # Browser startup runs in the workers before their first contact
+            startup = send_metrics.histograms.get("startup")
+            record_run(logger, history, journal.campaign_id, successful_sends + failed_sends, successful_sends, failed_sends, sum(1 for stats in worker_stats.values() if stats["success"] + stats["failed"]), elapsed - (startup.max if startup else 0))
+        deliveries = {"confirmed": 0, "pending": 0, "failed": 0}
+        for stats in worker_stats.values():
+            for status, count in stats["deliveries"].items():
+                deliveries[status] += count
+        log_summary(logger, successful_sends + failed_sends, successful_sends, failed_sends, worker_stats, skipped=skipped_counts(number_filter, journal), deliveries=deliveries)
+        export_metrics(logger, journal.campaign_id, metrics_json, metrics_prom)
+        if any(stats["qr_needed"] for stats in worker_stats.values()):
+            sys.exit(EXIT_QR_NEEDED)
+        return
+    
+    logger.info("Configuring %s...%s%s", browser.capitalize(), ' (headless)' if headless else '', ' (lean)' if lean and not headless else '')
+    supervisor = supervise_browser(firefox_profiles[0] if firefox_profiles else None, browser_options, logger, max_restarts)
+    browser_lost = False
+    if results_path:
+        result_log.open(results_path, campaign=journal.campaign_id)
+
+    try:
+        clock = send_metrics.clock()
+        try:
+            supervisor.start()
+        except BrowserStartError as e:
+            if e.qr_needed:
+                logger.error("QR NEEDED - %s, run once without --headless and scan the QR code", e)
+                sys.exit(EXIT_QR_NEEDED)
+            logger.error("CRITICAL ERROR - %s", e)
+            sys.exit(1)
+        logger.info("WhatsApp Web logged in")
+        clock.mark("startup")
+        sending_started = time.time()
 
         total_contacts = 0
         successful_sends = 0
         failed_sends = 0
         
-        logger.info(f"Reading CSV file: {csv_file}")
+        journal.open()
         
-        with open(csv_file, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            
-            for row_num, row in enumerate(reader, 1):
-                numero = row.get("Numero")
-                nombre = row.get("Nombre")
-                
-                if not numero or not nombre:
-                    logger.warning(f"ROW {row_num} - Incomplete data: Numero='{numero}', Nombre='{nombre}' - SKIPPING")
-                    continue
-                    
+        if forward:
+            sends = send_forwarded(supervisor, contacts, send_options, forward, logger)
+        else:
+            sends = send_each(supervisor, contacts, send_options, logger)
+        
+        try:
+            for row_num, numero, nombre, success in sends:
                 total_contacts += 1
-                logger.info(f"PROCESSING {total_contacts} - Number: {numero}, Name: {nombre}")
-                
-                success = send_message_with_retry(driver, wait, numero, nombre, template_name=template_name, max_attempts=2)
+                journal.record(row_num, numero, nombre, "sent" if success else "failed")
                 
+                eta = format_duration(estimate_remaining(total_contacts, total_pending, time.time() - sending_started))
                 if success:
                     successful_sends += 1
-                    logger.info(f"CONTACT {total_contacts} COMPLETED - Success: {successful_sends}/{total_contacts}")
+                    logger.info("CONTACT %s COMPLETED - Success: %s/%s - ETA %s", total_contacts, successful_sends, total_contacts, eta)
                 else:
                     failed_sends += 1
-                    logger.error(f"CONTACT {total_contacts} FAILED - Failures: {failed_sends}/{total_contacts}")
+                    logger.error("CONTACT %s FAILED - Failures: %s/%s - ETA %s", total_contacts, failed_sends, total_contacts, eta)
                     logger.info("Moving to next contact...")
                 
-                logger.debug("Pause of 3 seconds before next message...")
-                time.sleep(3)
-
-        logger.info("=" * 50)
-        logger.info("FINAL SUMMARY")
-        logger.info(f"Total contacts processed: {total_contacts}")
-        logger.info(f"Messages sent successfully: {successful_sends}")
-        logger.info(f"Failed messages: {failed_sends}")
-        logger.info(f"Success rate: {(successful_sends/total_contacts*100):.1f}%" if total_contacts > 0 else "Success rate: 0%")
-        logger.info("PROCESS COMPLETED")
-        logger.info("=" * 50)
+                check_deliveries(supervisor.driver, logger)
+        except BrowserStartError as e:
+            # The contact being sent is not journaled, so --resume continues from it
+            logger.error("CRITICAL ERROR - %s, stopping after %s contacts", e, total_contacts)
+            browser_lost = True
+
+        if history_path:
+            record_run(logger, history, journal.campaign_id, total_contacts, successful_sends, failed_sends, 1, time.time() - sending_started)
+        if not browser_lost:
+            check_deliveries(supervisor.driver, logger, delivery_timeout)
+        log_summary(logger, total_contacts, successful_sends, failed_sends, skipped=skipped_counts(number_filter, journal), deliveries=delivery_tracker.counts())
+        export_metrics(logger, journal.campaign_id, metrics_json, metrics_prom)
+        if browser_lost:
+            sys.exit(1)
 
     except FileNotFoundError:
-        logger.error(f"CRITICAL ERROR - File not found: {csv_file}")
+        logger.error("CRITICAL ERROR - File not found: %s", csv_file)
         sys.exit(1)
         
     except Exception as e:
-        logger.error(f"CRITICAL ERROR - Unexpected error in main: {e}")
+        logger.error("CRITICAL ERROR - Unexpected error in main: %s", e)
         sys.exit(1)
         
     finally:
-        try:
-            driver.quit()
-            logger.info("Browser closed successfully")
-        except:
-            logger.warning("Could not close browser correctly")
+        journal.close()
+        save_selector_cache(logger)
+        result_log.close()
+        supervisor.stop()
+        logger.info("Browser closed")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Send WhatsApp messages from CSV")
-    parser.add_argument("csv_file", help="Path to CSV file with Numero and Nombre columns")
+    parser.add_argument("csv_file", nargs="?", help="Path to CSV file with Numero and Nombre columns")
     parser.add_argument("--template", "-t", default="default", help="Message template name (default: 'default')")
-    parser.add_argument("--profile", "-p", help="Firefox profile path")
+    parser.add_argument("--browser", "-b", choices=BROWSERS, default="firefox", help="Browser to send with: firefox or chromium (default: 'firefox')")
+    parser.add_argument("--profile", "-p", action="append", help="Firefox profile path or Chromium user data directory (repeat to run one worker per profile)")
+    parser.add_argument("--compose", "-c", choices=COMPOSE_MODES, default="paste", help="How the message is written into the chat: paste, insert or type (default: 'paste')")
+    parser.add_argument("--open", "-o", choices=OPEN_MODES, default="search", help="How each chat is opened: search or link (default: 'search')")
+    parser.add_argument("--prefill", action="store_true", help="Pre-fill the message through the chat link (only with --open link)")
+    parser.add_argument("--headless", action="store_true", help="Run the browser without a window (implies --lean); exits with code 3 if the profile needs a QR scan")
+    parser.add_argument("--lean", action="store_true", help="Disable images, media autoplay and animations in the browser (Chromium also blocks them at the network layer)")
+    parser.add_argument("--login-timeout", type=int, metavar="SECONDS", help=f"Seconds to wait for the WhatsApp Web login, e.g. to scan the QR code in a visible browser (default: {STEP_TIMEOUTS['login']}; 0 waits without limit)")
+    parser.add_argument("--max-restarts", type=int, default=3, help="Times a crashed browser is restarted before the run stops (default: 3)")
+    parser.add_argument("--recycle-memory", type=float, default=DEFAULT_MAX_MEMORY_MB, metavar="MB", help=f"Recycle the WhatsApp Web tab when browser and driver use more memory than this (default: {DEFAULT_MAX_MEMORY_MB}; 0 to disable)")
+    parser.add_argument("--recycle-drift", type=float, default=DEFAULT_MAX_DRIFT, metavar="RATIO", help=f"Recycle the tab when sends get this many times slower than at the start (default: {DEFAULT_MAX_DRIFT:g}; 0 to disable)")
+    parser.add_argument("--recycle-every", type=int, default=0, metavar="N", help="Recycle the tab every N contacts (default: 0, only on memory or slowdown)")
+    parser.add_argument("--min-rate", type=float, default=DEFAULT_MIN_RATE, help=f"Lowest send rate in messages per minute, used at start and after errors (default: {DEFAULT_MIN_RATE:g})")
+    parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE, help=f"Highest send rate in messages per minute (default: {DEFAULT_MAX_RATE:g})")
+    parser.add_argument("--max-per-hour", type=int, help="Most messages sent in any 60 minutes, per sender profile (default: no cap)")
+    parser.add_argument("--campaign", help="Campaign id used for the send journal (default: CSV file name)")
+    parser.add_argument("--resume", action="store_true", help="Skip numbers already sent in this campaign according to its journal")
+    parser.add_argument("--attach", "-a", metavar="FILE", help="Image or document sent with every message, with the message as caption (an 'Adjunto' CSV column sets it per contact)")
+    parser.add_argument("--map", "-m", action="append", default=[], metavar="COLUMN=VARIABLE", help="Pass a CSV column to the template as another variable (repeatable)")
+    parser.add_argument("--country-code", default=DEFAULT_COUNTRY_CODE, help=f"Country code added to numbers without one (default: {DEFAULT_COUNTRY_CODE})")
+    parser.add_argument("--metrics-json", default="wasapy_metrics.json", help="File for the per-phase timing metrics in JSON (default: wasapy_metrics.json)")
+    parser.add_argument("--metrics-prom", help="File for the metrics in Prometheus textfile collector format")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH, help=f"JSONL file with one result record per contact, appended to (default: {DEFAULT_RESULTS_PATH}; empty to disable)")
+    parser.add_argument("--collect-replies", action="store_true", help="Write the new replies of the CSV contacts to the replies file instead of sending")
+    parser.add_argument("--replies", default=DEFAULT_REPLIES_PATH, help=f"JSONL file (or .csv) the collected replies are appended to (default: {DEFAULT_REPLIES_PATH})")
+    parser.add_argument("--schedule", action="store_true", help="Add the CSV campaign to the schedule store instead of sending it now")
+    parser.add_argument("--scheduler", action="store_true", help="Send the jobs of the schedule store as they become due, until stopped")
+    parser.add_argument("--store", default=DEFAULT_SCHEDULE_PATH, help=f"SQLite file of the scheduled jobs (default: {DEFAULT_SCHEDULE_PATH})")
+    parser.add_argument("--priority", type=int, default=0, help="Priority of a scheduled campaign; due sends of higher priority go first (default: 0)")
+    parser.add_argument("--not-before", metavar="DATETIME", help="Do not send a scheduled campaign before this local time, e.g. '2025-10-20 09:00'")
+    parser.add_argument("--window", metavar="HH:MM-HH:MM", help="Daily sending window of a scheduled campaign (default: all day)")
+    parser.add_argument("--daily-quota", type=int, metavar="N", help="Most messages of a scheduled campaign sent per day (default: no quota)")
+    parser.add_argument("--max-per-day", type=int, metavar="N", help="Most messages the scheduler sends per day over all jobs (default: no cap)")
+    parser.add_argument("--daemon", action="store_true", help="Keep the browsers running and take send jobs from the local job API instead of a CSV file")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port of the job API on localhost in daemon mode (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", help="Serve the job API on this Unix socket instead of a TCP port")
+    parser.add_argument("--forward", nargs="?", type=int, const=MAX_FORWARD_RECIPIENTS, default=0, metavar="N", help=f"Send each distinct message once and forward it to the other contacts with the same message, N chats at a time (default N: {MAX_FORWARD_RECIPIENTS}; single profile only)")
+    parser.add_argument("--plan", action="store_true", help="Forecast duration, failures and throughput of the campaign from past runs, without sending")
+    parser.add_argument("--workers", type=int, help="Worker count for --plan (default: number of --profile options)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help=f"JSON file with the timings and outcomes of past runs, used by --plan (default: {DEFAULT_HISTORY_PATH}; empty to disable)")
+    parser.add_argument("--delivery-timeout", type=float, default=30, help="Seconds to keep checking pending deliveries at the end of the run (default: 30)")
+    parser.add_argument("--debug", action="store_true", help="Also write debug messages to the log")
     args = parser.parse_args()
+    if args.debug:
+        log_level = logging.DEBUG
+    
+    column_map = {}
+    for mapping in args.map:
+        column, separator, variable = mapping.partition("=")
+        if not separator or not column or not variable:
+            parser.error(f"Invalid --map value '{mapping}', expected COLUMN=VARIABLE")
+        column_map[column] = variable
+    if args.login_timeout is not None and args.login_timeout < 0:
+        parser.error("--login-timeout must be 0 or more seconds")
 
-    main(args.csv_file, template_name=args.template, firefox_profile=args.profile)
\ No newline at end of file
+    if args.daemon:
+        run_daemon(firefox_profile=args.profile, compose_mode=args.compose, open_mode=args.open, prefill=args.prefill, min_rate=args.min_rate, max_rate=args.max_rate, max_per_hour=args.max_per_hour, country_code=args.country_code, delivery_timeout=args.delivery_timeout, headless=args.headless, lean=args.lean, login_timeout=args.login_timeout, max_restarts=args.max_restarts, port=args.port, socket_path=args.socket, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, results_path=args.results, browser=args.browser, recycle_memory=args.recycle_memory, recycle_drift=args.recycle_drift, recycle_every=args.recycle_every)
+    elif args.scheduler:
+        run_scheduler(firefox_profile=args.profile, schedule_path=args.store, compose_mode=args.compose, open_mode=args.open, prefill=args.prefill, min_rate=args.min_rate, max_rate=args.max_rate, max_per_hour=args.max_per_hour, max_per_day=args.max_per_day, delivery_timeout=args.delivery_timeout, headless=args.headless, lean=args.lean, login_timeout=args.login_timeout, max_restarts=args.max_restarts, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, results_path=args.results, browser=args.browser, recycle_memory=args.recycle_memory, recycle_drift=args.recycle_drift, recycle_every=args.recycle_every)
+    elif not args.csv_file:
+        parser.error("csv_file is required unless --daemon or --scheduler is used")
+    elif args.schedule:
+        schedule_campaign(args.csv_file, template_name=args.template, campaign_id=args.campaign, resume=args.resume, column_map=column_map, country_code=args.country_code, attachment=args.attach, schedule_path=args.store, priority=args.priority, not_before=args.not_before, window=args.window, daily_quota=args.daily_quota)
+    elif args.collect_replies:
+        collect_replies(args.csv_file, firefox_profile=args.profile, campaign_id=args.campaign, country_code=args.country_code, headless=args.headless, lean=args.lean, login_timeout=args.login_timeout, max_restarts=args.max_restarts, replies_path=args.replies, browser=args.browser)
+    else:
+        main(args.csv_file, template_name=args.template, firefox_profile=args.profile, compose_mode=args.compose, open_mode=args.open, prefill=args.prefill, min_rate=args.min_rate, max_rate=args.max_rate, max_per_hour=args.max_per_hour, campaign_id=args.campaign, resume=args.resume, column_map=column_map, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, country_code=args.country_code, delivery_timeout=args.delivery_timeout, headless=args.headless, lean=args.lean, login_timeout=args.login_timeout, max_restarts=args.max_restarts, results_path=args.results, history_path=args.history, plan=args.plan, workers=args.workers, forward=args.forward, attachment=args.attach, browser=args.browser, recycle_memory=args.recycle_memory, recycle_drift=args.recycle_drift, recycle_every=args.recycle_every)
\ No newline at end of file